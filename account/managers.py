@@ -1,3 +1,4 @@
+from django.db.models import F
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import BaseUserManager
 
@@ -21,3 +22,23 @@ class CustomUserManager(BaseUserManager):
             raise ValueError(_('Superuser must have is_superuser=True.'))
 
         return self.create_user(email, name, phone_number, password, **extra_fields)
+
+    def adjust_counter(self, pk, field, delta):
+        """
+        Atomically add ``delta`` to a denormalized counter column of one user.
+        Decrements that would push the counter below zero are skipped.
+        """
+        queryset = self.filter(pk=pk)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        return queryset.update(**{field: F(field) + delta})
+
+    def adjust_counters(self, pks, field, delta):
+        """
+        Add ``delta`` to the same counter column of several users with a single UPDATE.
+        Decrements that would push a counter below zero are skipped.
+        """
+        queryset = self.filter(pk__in=pks)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        return queryset.update(**{field: F(field) + delta})
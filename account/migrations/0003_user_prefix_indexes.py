@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# Prefix (typeahead) indexes for the user search in mobile.search. They are backend specific,
+# so they are created with SQL instead of Meta.indexes:
+#   - PostgreSQL: lowercase functional indexes with text_pattern_ops, which serve
+#     LOWER(column) LIKE 'prefix%' whatever the database collation.
+#   - MySQL: the default collations are case-insensitive, so a plain index on name serves
+#     name LIKE 'prefix%'; username and phone_number already have unique indexes.
+# Other backends use the in-process prefix index instead.
+FORWARD_SQL = {
+    'postgresql': [
+        "CREATE INDEX account_user_name_prefix_idx ON account_user (LOWER(name) text_pattern_ops)",
+        "CREATE INDEX account_user_username_prefix_idx ON account_user (LOWER(username) text_pattern_ops)",
+        "CREATE INDEX account_user_phone_prefix_idx ON account_user (phone_number varchar_pattern_ops)",
+    ],
+    'mysql': [
+        "CREATE INDEX account_user_name_prefix_idx ON account_user (name)",
+    ],
+}
+
+REVERSE_SQL = {
+    'postgresql': [
+        "DROP INDEX IF EXISTS account_user_name_prefix_idx",
+        "DROP INDEX IF EXISTS account_user_username_prefix_idx",
+        "DROP INDEX IF EXISTS account_user_phone_prefix_idx",
+    ],
+    'mysql': [
+        "DROP INDEX account_user_name_prefix_idx ON account_user",
+    ],
+}
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_user_follow_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_for_vendor(FORWARD_SQL), run_for_vendor(REVERSE_SQL)),
+    ]
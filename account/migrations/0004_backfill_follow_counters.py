@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-18 14:05
+
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    User = apps.get_model('account', 'User')
+    Follow = apps.get_model('mobile', 'Follow')
+
+    def count_of(field):
+        counts = Follow.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    User.objects.update(follower_count=count_of('following'), following_count=count_of('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_user_prefix_indexes'),
+        ('mobile', '0002_follow'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -28,6 +28,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     reset_otp = models.CharField(max_length=7, null=True, blank=True)
     otp_created_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
+    follower_count = models.PositiveIntegerField(default=0, editable=False, help_text="Denormalized number of users following this user.")
+    following_count = models.PositiveIntegerField(default=0, editable=False, help_text="Denormalized number of users this user follows.")
 
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -3,6 +3,11 @@ ASGI config for api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests to the event stream (mobile.events.EVENTS_PATH) are served by the event stream
+application directly; everything else goes to Django. The Procfile serves it with gunicorn's
+uvicorn workers; with more than one worker process, set REDIS_URL so that events published by
+one worker reach the streams held by the others (see mobile.events.RedisBroker).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -13,4 +18,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up: the event stream uses the models and settings.
+from mobile.events import EVENTS_PATH, EventStreamApp
+
+events_application = EventStreamApp()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await events_application(scope, receive, send)
+    return await django_application(scope, receive, send)
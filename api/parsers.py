@@ -0,0 +1,27 @@
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.exceptions import ParseError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class FastJSONParser(JSONParser):
+    """
+    Drop-in replacement for DRF's JSONParser backed by orjson.
+
+    orjson is strict by default (NaN and Infinity are rejected), which matches STRICT_JSON.
+    Falls back to the stdlib parser when orjson is not installed, when the request body is not
+    UTF-8 encoded, or when STRICT_JSON is turned off.
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,42 @@
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Replacement for DRF's JSONRenderer backed by orjson.
+
+    Like JSONRenderer it writes compact separators and raw UTF-8 with \\u2028/\\u2029
+    escaped, and types orjson does not handle the way DRF does (datetimes, Decimals, lazy
+    translation strings, querysets, ...) are routed through DRF's own JSONEncoder.default, so
+    the payloads of this API (strings, integers, booleans, datetimes) render byte for byte
+    the same. Floats differ:
+      - they are written in orjson's shortest form, e.g. 1e16 where JSONRenderer writes 1e+16;
+      - NaN and Infinity render as null, where JSONRenderer (STRICT_JSON) raises
+        "Out of range float values are not JSON compliant".
+    The stdlib renderer is used instead when orjson is not installed, when indentation is
+    requested (e.g. by the browsable API), when COMPACT_JSON or UNICODE_JSON are turned off,
+    or when orjson rejects a value (e.g. integers wider than 64 bits). The orjson options used
+    exist since orjson 3.4.
+    """
+    options = 0
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=encoders.JSONEncoder().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escape \u2028 and \u2029 like JSONRenderer, so the output stays a strict javascript subset.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -181,8 +181,69 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # orjson-backed JSON with a stdlib fallback, see api/renderers.py and api/parsers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# The response cache and its version keys must be shared by every worker in production, so
+# Redis is used there; development and the test runner keep the per-process LocMemCache.
+if str(os.getenv("NODE_ENV"))=="production" and os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': 'uplink',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'uplink',
+        }
+    }
+
+# Versioned response cache for the public post endpoints (seconds)
+MOBILE_CACHE_TIMEOUT = 60
+MOBILE_CACHE_STALE_TIMEOUT = 30
+MOBILE_CACHE_LOCK_TIMEOUT = 10
+
+# Keyset (cursor) pagination for the mobile list endpoints
+MOBILE_PAGE_SIZE = 20
+MOBILE_MAX_PAGE_SIZE = 100
+
+# Number of most recent likes embedded in each post; the full list is paginated by PostLikes
+MOBILE_LIKES_PREVIEW_SIZE = 3
+
+# Number of most recent comments embedded in each post; the full list is paginated by PostComments
+MOBILE_COMMENTS_PREVIEW_SIZE = 3
+
+# Write-behind buffering of like toggles for viral posts. When enabled, TogglePostLike answers
+# from a journal table shared by every worker that is flushed to PostLike every
+# MOBILE_LIKE_BUFFER_INTERVAL seconds, MOBILE_LIKE_BUFFER_BATCH_SIZE entries per transaction.
+# An entry that fails MOBILE_LIKE_BUFFER_MAX_ATTEMPTS times is dropped.
+MOBILE_LIKE_BUFFER = False
+MOBILE_LIKE_BUFFER_INTERVAL = 1.0
+MOBILE_LIKE_BUFFER_BATCH_SIZE = 1000
+MOBILE_LIKE_BUFFER_MAX_ATTEMPTS = 5
+
+# Rows read per query by the NDJSON export endpoints
+MOBILE_EXPORT_BATCH_SIZE = 500
+
+# Home timeline fan-out. Accounts with at least TIMELINE_FANOUT_LIMIT followers are
+# merged into timelines at read time instead of being copied to every follower.
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+TIMELINE_BACKFILL_SIZE = 50
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -260,4 +321,29 @@ JAZZMIN_SETTINGS = {
     "changeform_format": "horizontal_tabs",
     "changeform_format_overrides": {"auth.user": "collapsible", "auth.group": "vertical_tabs"},
     "related_modal_active": False,
-}
\ No newline at end of file
+}
+
+# Typeahead user search: default number of results, and how often (seconds) the in-process
+# prefix index used on backends without prefix indexes (SQLite) is rebuilt to pick up edits
+MOBILE_USER_SEARCH_LIMIT = 10
+MOBILE_USER_SEARCH_INDEX_TTL = 60
+
+# Maximum number of user ids accepted by one relationship lookup
+MOBILE_RELATIONSHIPS_MAX_IDS = 100
+
+# "People you may know": suggestions stored per user by the compute_suggestions command,
+# and users written per transaction while computing them
+MOBILE_SUGGESTIONS_SIZE = 20
+MOBILE_SUGGESTIONS_BATCH_SIZE = 1000
+
+# Maximum number of user ids accepted by one bulk follow/unfollow request
+MOBILE_BULK_FOLLOW_MAX_IDS = 100
+
+# Server-Sent Events stream of new messages and read receipts (api/asgi.py, mobile/events.py).
+# LocalBroker only reaches streams served by the same process, so with REDIS_URL set (always
+# the case with several workers) events go through Redis pub/sub instead.
+MOBILE_EVENTS_REDIS_URL = os.getenv('REDIS_URL')
+MOBILE_EVENTS_BROKER = 'mobile.events.RedisBroker' if MOBILE_EVENTS_REDIS_URL else 'mobile.events.LocalBroker'
+MOBILE_EVENTS_HEARTBEAT = 15
+MOBILE_EVENTS_QUEUE_SIZE = 100
+MOBILE_EVENTS_SEND_TIMEOUT = 10
@@ -9,9 +9,11 @@ class Category(models.Model):
     Attributes:
         name (str): The name of the category.
         slug (str): A URL-friendly version of the category name, generated automatically.
+        updated_at (datetime): The date and time when the category was last updated.
     """
     name = models.CharField(max_length=255, unique=True, help_text="Enter the name of the category.")
     slug = models.SlugField(max_length=255, unique=True, editable=False, help_text="Automatically generated from the category name.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="The date and time when the category was last updated.")
 
     def save(self, *args, **kwargs):
         """
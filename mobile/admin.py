@@ -20,6 +20,8 @@ class PostAdmin(admin.ModelAdmin):
         'id',
         'title',
         'category',
+        'like_count',
+        'comment_count',
         'created_at',
         'updated_at',
         'edit_link',
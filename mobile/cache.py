@@ -0,0 +1,114 @@
+import time
+import hashlib
+from django.conf import settings
+from django.db import transaction
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'mobile:feed:version'
+
+def post_version_key(post_id):
+    return f'mobile:post:{post_id}:version'
+
+def _initial_version():
+    # Seed versions from the clock so a version key that was evicted never
+    # comes back with a value an older cached body was stamped with.
+    return time.time_ns() // 1000
+
+def get_version(key):
+    """
+    Return the current version number stored under ``key``, creating it if needed.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+def bump_version(key):
+    """
+    Increment the version stored under ``key``, invalidating every body stamped with the old one.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+
+def bump_feed_version():
+    """
+    Invalidate every cached feed page once the current transaction commits.
+    """
+    transaction.on_commit(lambda: bump_version(FEED_VERSION_KEY))
+
+def bump_post_version(post_id):
+    """
+    Invalidate the cached detail of one post, and the feed pages that embed it,
+    once the current transaction commits. Other feed pages stay cached.
+    """
+    transaction.on_commit(lambda: bump_version(post_version_key(post_id)))
+
+def get_versions(keys):
+    """
+    Return {key: version} for several version keys in one cache round trip, creating missing ones.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = get_version(key)
+    return versions
+
+def _items_fresh(entry):
+    items = entry.get('items')
+    return not items or cache.get_many(list(items)) == items
+
+def build_cache_key(prefix, request):
+    """
+    Key a cached body by the absolute request URI, which covers the host used to
+    build media URLs as well as the query string (cursor, page size, ...).
+    """
+    digest = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f'{prefix}:{digest}'
+
+def get_or_build(key, version_key, build, item_version_keys=None):
+    """
+    Return the response body cached under ``key``, rebuilding it with ``build()`` when missing or stale.
+
+    A cached body is fresh while it carries the current value of ``version_key`` and is younger than
+    MOBILE_CACHE_TIMEOUT seconds. ``item_version_keys(body)`` optionally lists the version keys of
+    the items the body embeds (e.g. the posts of a feed page); the body is then also stale once one
+    of their versions moves, so a change to one item only rebuilds the bodies embedding it. Item
+    versions are read right after the build, so a change committed during the build can be
+    served until the body expires. Rebuilds are single-flighted: only the worker that wins
+    ``cache.add`` on the lock key calls ``build()``. Other workers serve the previous body for up to
+    MOBILE_CACHE_STALE_TIMEOUT more seconds (stale-while-revalidate), or, when there is nothing to
+    serve, wait briefly for the winner before falling back to building the body themselves.
+    """
+    timeout = getattr(settings, 'MOBILE_CACHE_TIMEOUT', 60)
+    stale_timeout = getattr(settings, 'MOBILE_CACHE_STALE_TIMEOUT', 30)
+    lock_timeout = getattr(settings, 'MOBILE_CACHE_LOCK_TIMEOUT', 10)
+
+    version = get_version(version_key)
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and entry['version'] == version and entry['fresh_until'] > now and _items_fresh(entry):
+        return entry['data']
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            data = build()
+            items = get_versions(item_version_keys(data)) if item_version_keys else None
+            cache.set(key, {'version': version, 'items': items, 'fresh_until': now + timeout, 'data': data}, timeout + stale_timeout)
+            return data
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        return entry['data']
+
+    deadline = now + getattr(settings, 'MOBILE_CACHE_WAIT_TIMEOUT', 2)
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == version:
+            return entry['data']
+    return build()
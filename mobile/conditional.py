@@ -0,0 +1,134 @@
+import hashlib
+from functools import wraps
+from django.contrib.auth import get_user_model
+from django.utils.http import quote_etag
+from django.utils.cache import get_conditional_response
+from django.db.models import Q, Max, Sum, Count, Exists, OuterRef, Subquery
+from base.models import Category
+from mobile.models import Post, PostLike, PostImage, PostComment, Message, Follow
+from mobile.like_buffer import get_viewer_version
+
+def conditional_get(validators):
+    """
+    Add ETag support to an APIView 'get' handler.
+
+    ``validators(request, *args, **kwargs)`` must return the state of the resource computed from
+    cheap aggregate queries, or None when the resource does not exist. The ETag is a digest of the
+    state, the full request path and the requesting user, so a matching If-None-Match
+    short-circuits to 304 Not Modified before the handler runs and before anything is serialized.
+    The ETag is only attached to 200 responses.
+
+    No Last-Modified is sent: deletes, counter updates and bulk updates change the state without
+    moving any timestamp, so If-Modified-Since could not be answered reliably.
+    """
+    def decorator(func):
+        @wraps(func)
+        def inner(self, request, *args, **kwargs):
+            state = validators(request, *args, **kwargs)
+            if state is None:
+                return func(self, request, *args, **kwargs)
+
+            # Buffered like toggles are not in the database yet but already show in the body.
+            viewer_version = get_viewer_version(request.user)
+            fingerprint = repr((request.get_full_path(), request.user.pk, state, viewer_version)).encode('utf-8')
+            etag = quote_etag(hashlib.md5(fingerprint).hexdigest())
+
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return response
+
+            response = func(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+def _post_set_state(posts):
+    """
+    Aggregate state of a set of posts and of the images, likes and comments they embed.
+    Runs four aggregate queries regardless of how many posts are in the set.
+    """
+    post_state = posts.aggregate(
+        count=Count('id'), max_id=Max('id'), updated=Max('updated_at'),
+        likes=Sum('like_count'), comments=Sum('comment_count'),
+    )
+    like_state = PostLike.objects.filter(post__in=posts).aggregate(max_id=Max('id'), created=Max('created_at'))
+    comment_state = PostComment.objects.filter(post__in=posts).aggregate(max_id=Max('id'), updated=Max('updated_at'))
+    image_state = PostImage.objects.filter(post__in=posts).aggregate(count=Count('id'), max_id=Max('id'), created=Max('created_at'))
+    return (
+        tuple(sorted(post_state.items())), tuple(sorted(like_state.items())),
+        tuple(sorted(comment_state.items())), tuple(sorted(image_state.items())),
+    )
+
+def post_detail_validators(request, pk, *args, **kwargs):
+    """
+    Validators for PostDetails, read in a single query with correlated subqueries.
+    """
+    def latest(model, field):
+        rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post')
+        return Subquery(rows.annotate(value=Max(field)).values('value'))
+
+    viewer_id = request.user.pk if request.user.is_authenticated else None
+    row = Post.objects.filter(pk=pk).values(
+        'updated_at', 'user_id', 'like_count', 'comment_count',
+        # The viewer-relative fields of the body (see mobile.viewer).
+        viewer_likes=Exists(PostLike.objects.filter(post=OuterRef('pk'), user_id=viewer_id)),
+        viewer_follows=Exists(Follow.objects.filter(following=OuterRef('user_id'), follower_id=viewer_id)),
+        last_like_id=latest(PostLike, 'id'),
+        last_like_at=latest(PostLike, 'created_at'),
+        last_comment_id=latest(PostComment, 'id'),
+        last_comment_at=latest(PostComment, 'updated_at'),
+        last_image_id=latest(PostImage, 'id'),
+        last_image_at=latest(PostImage, 'created_at'),
+    ).first()
+    if row is None:
+        return None
+    return tuple(sorted(row.items()))
+
+def user_posts_validators(request, user_id, *args, **kwargs):
+    """
+    Validators for GetUserPosts: the user's profile row plus the aggregate state of their posts.
+    """
+    user = get_user_model().objects.filter(pk=user_id).values('name', 'email', 'phone_number', 'username', 'image').first()
+    if user is None:
+        return None
+    state = _post_set_state(Post.objects.filter(user_id=user_id))
+    # Whether the viewer follows the user shows up in every post's 'is_author_followed'.
+    followed = request.user.is_authenticated and Follow.objects.filter(follower_id=request.user.pk, following_id=user_id).exists()
+    return tuple(sorted(user.items())), state, followed
+
+def categories_validators(request, *args, **kwargs):
+    """
+    Validators for GetCategories: the categories served and the posts nested under them.
+    """
+    categories = Category.objects.all()
+    category_state = categories.aggregate(count=Count('id'), max_id=Max('id'), updated=Max('updated_at'))
+    state = _post_set_state(Post.objects.filter(category__in=categories))
+    return tuple(sorted(category_state.items())), state
+
+def category_detail_validators(request, pk, *args, **kwargs):
+    """
+    Validators for CategoryDetails: the category row and the posts nested under it.
+    """
+    category = Category.objects.filter(pk=pk).values('name', 'slug', 'updated_at').first()
+    if category is None:
+        return None
+    state = _post_set_state(Post.objects.filter(category_id=pk))
+    return tuple(sorted(category.items())), state
+
+def message_history_validators(request, user_id, *args, **kwargs):
+    """
+    Validators for MessageHistoryView: one aggregate over the conversation between the two users,
+    read through the (conversation, id) index.
+    """
+    if not request.user.is_authenticated:
+        return None
+    user_low, user_high = sorted((request.user.pk, user_id))
+    state = Message.objects.filter(
+        conversation__user_low_id=user_low, conversation__user_high_id=user_high,
+    ).aggregate(
+        count=Count('id'), max_id=Max('id'), updated=Max('updated_at'),
+        read=Count('id', filter=Q(is_read=True)), read_at=Max('read_at'),
+    )
+    return tuple(sorted(state.items()))
@@ -0,0 +1,221 @@
+from django.db.models import Q, F, Sum, Count
+from django.utils import timezone
+from django.db import transaction, IntegrityError
+from mobile.models import Message, Conversation
+from mobile.events import publish_message, publish_read
+from mobile.pagination import KeysetPagination, InvalidCursor, keyset_filter
+
+INBOX_ORDERING = ('-last_activity_at', '-id')
+
+def _pair(user_id, other_id):
+    return (user_id, other_id) if user_id <= other_id else (other_id, user_id)
+
+def _unread_field(conversation, user_id):
+    return 'unread_low' if conversation.user_low_id == user_id else 'unread_high'
+
+def lock_conversation(user_id, other_id):
+    """
+    Return the conversation between two users, created if needed, locked for the rest of the
+    current transaction. Must be called inside transaction.atomic().
+    """
+    user_low, user_high = _pair(user_id, other_id)
+    conversations = Conversation.objects.select_for_update()
+    try:
+        return conversations.get(user_low_id=user_low, user_high_id=user_high)
+    except Conversation.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return Conversation.objects.create(user_low_id=user_low, user_high_id=user_high, last_activity_at=timezone.now())
+    except IntegrityError:
+        # Created by a concurrent first message.
+        return conversations.get(user_low_id=user_low, user_high_id=user_high)
+
+def record_message(conversation, message):
+    """
+    Make ``message`` the last message of its (locked) conversation and count it as unread
+    for the receiver, with a single UPDATE.
+    """
+    changes = {'last_message': message, 'last_activity_at': message.created_at}
+    if message.receiver_id != message.sender_id:
+        field = _unread_field(conversation, message.receiver_id)
+        changes[field] = F(field) + 1
+    Conversation.objects.filter(pk=conversation.pk).update(**changes)
+
+def send_message(serializer):
+    """
+    Save a validated MessageCreateSerializer and record the message in its conversation, in
+    one transaction. The conversation row is locked before the message is created, so the
+    messages of a conversation are recorded in the order of their creation times. The message
+    is pushed to both users' event streams once the transaction commits.
+    """
+    with transaction.atomic():
+        conversation = lock_conversation(serializer.context['request'].user.pk, serializer.validated_data['receiver'].pk)
+        message = serializer.save(conversation=conversation)
+        record_message(conversation, message)
+        publish_message(message)
+    return message
+
+def refresh_conversation(conversation):
+    """
+    Recompute the last message and unread counters of a (locked) conversation from its messages,
+    removing it if it has none left.
+    """
+    messages = Message.objects.filter(conversation_id=conversation.pk)
+    last = messages.order_by('-id').first()
+    if last is None:
+        Conversation.objects.filter(pk=conversation.pk).delete()
+        return
+    unread = messages.filter(is_read=False).exclude(sender_id=F('receiver_id')).aggregate(
+        low=Count('id', filter=Q(receiver_id=conversation.user_low_id)),
+        high=Count('id', filter=Q(receiver_id=conversation.user_high_id)),
+    )
+    Conversation.objects.filter(pk=conversation.pk).update(
+        last_message=last, last_activity_at=last.created_at, unread_low=unread['low'], unread_high=unread['high'],
+    )
+
+def edit_message(serializer):
+    """
+    Save a validated MessageCreateSerializer bound to an existing message, in one transaction.
+    The conversation does not change unless the receiver does, in which case the message moves
+    to the conversation with the new receiver and both conversations are recomputed.
+    """
+    message = serializer.instance
+    receiver = serializer.validated_data.get('receiver')
+    with transaction.atomic():
+        conversation = lock_conversation(message.sender_id, message.receiver_id)
+        if receiver is None or receiver.pk == message.receiver_id:
+            return serializer.save()
+        target = lock_conversation(message.sender_id, receiver.pk)
+        message = serializer.save(conversation=target)
+        refresh_conversation(conversation)
+        refresh_conversation(target)
+    return message
+
+def delete_message(message):
+    """
+    Delete a message and keep its conversation in step, in one transaction: an unread message
+    no longer counts as unread, the previous message becomes the last one if it was the last,
+    and a conversation left without messages is removed.
+    """
+    with transaction.atomic():
+        conversation = lock_conversation(message.sender_id, message.receiver_id)
+        message_id = message.pk
+        message.delete()
+        if not message.is_read and message.receiver_id != message.sender_id:
+            field = _unread_field(conversation, message.receiver_id)
+            Conversation.objects.filter(pk=conversation.pk, **{f'{field}__gte': 1}).update(**{field: F(field) - 1})
+        if conversation.last_message_id not in (None, message_id):
+            return
+        previous = Message.objects.filter(conversation_id=conversation.pk).order_by('-id').first()
+        if previous is None:
+            Conversation.objects.filter(pk=conversation.pk).delete()
+        else:
+            Conversation.objects.filter(pk=conversation.pk).update(last_message=previous, last_activity_at=previous.created_at)
+
+def get_inbox(user, request):
+    """
+    Return (conversations, paginator) for one page of the user's inbox, most recent activity
+    first, whether the user sent or received the messages.
+
+    The user is user_low in some conversations and user_high in others, so the page is the
+    merge of two keyset-ordered streams sharing the same (last_activity_at, id) cursor, each
+    an index range scan of page_size + 1 rows. Only forward ('next') cursors are issued.
+    """
+    paginator = KeysetPagination(ordering=INBOX_ORDERING)
+    page_size = paginator.get_page_size(request)
+    position = None
+    cursor = request.query_params.get(paginator.cursor_query_param)
+    if cursor:
+        position, reverse = paginator.decode_cursor(cursor, model=Conversation)
+        if reverse:
+            raise InvalidCursor("Invalid cursor.")
+
+    conversations = {}
+    for side in ('user_low', 'user_high'):
+        stream = Conversation.objects.filter(**{f'{side}_id': user.pk})
+        if position is not None:
+            stream = stream.filter(keyset_filter(INBOX_ORDERING, position))
+        stream = stream.select_related('user_low', 'user_high', 'last_message__sender', 'last_message__receiver')
+        for conversation in stream.order_by(*INBOX_ORDERING)[:page_size + 1]:
+            conversations[conversation.pk] = conversation
+
+    conversations = sorted(conversations.values(), key=lambda conversation: (conversation.last_activity_at, conversation.pk), reverse=True)
+    has_more = len(conversations) > page_size
+    conversations = conversations[:page_size]
+    last = conversations[-1] if conversations else None
+    paginator.next_position = [last.last_activity_at, last.pk] if last and has_more else None
+    return conversations, paginator
+
+def parse_anchor(request, name):
+    """
+    Read an id anchor (?before= / ?after=). Raises ValueError for anything but a positive integer.
+    """
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    value = int(value)
+    if value <= 0:
+        raise ValueError(name)
+    return value
+
+def get_history(user, other_id, request, fields=None, expand=None):
+    """
+    Return (messages, has_more) for one page of the conversation between two users, oldest first.
+
+    - Without an anchor the page is the most recent messages.
+    - ?before=<message id> loads the messages older than that one ("load older").
+    - ?after=<message id> loads the messages newer than that one ("load newer").
+    has_more tells whether more messages exist beyond the page in the direction loaded.
+    Either way the page is one range scan of the (conversation, id) index, and nothing is counted.
+    Raises ValueError for an invalid anchor.
+    """
+    before, after = parse_anchor(request, 'before'), parse_anchor(request, 'after')
+    page_size = KeysetPagination(ordering=('id',)).get_page_size(request)
+    user_low, user_high = _pair(user.pk, other_id)
+    messages = Message.objects.for_display(fields, expand).filter(
+        conversation__user_low_id=user_low, conversation__user_high_id=user_high,
+    )
+    if after is not None:
+        page = list(messages.filter(id__gt=after).order_by('id')[:page_size + 1])
+        return page[:page_size], len(page) > page_size
+    if before is not None:
+        messages = messages.filter(id__lt=before)
+    page = list(messages.order_by('-id')[:page_size + 1])
+    return page[:page_size][::-1], len(page) > page_size
+
+def get_unread_total(user):
+    """
+    Number of unread messages across all the user's conversations, from the unread counters.
+    """
+    low = Conversation.objects.filter(user_low_id=user.pk).aggregate(total=Sum('unread_low'))['total']
+    high = Conversation.objects.filter(user_high_id=user.pk).aggregate(total=Sum('unread_high'))['total']
+    return (low or 0) + (high or 0)
+
+def mark_read(user, other_id, up_to_id=None):
+    """
+    Mark the messages the user received from ``other_id`` as read, up to message ``up_to_id``
+    included (all of them when None), and return (messages marked, unread left in the conversation).
+
+    The messages are marked with a single UPDATE served by the partial index on unread messages,
+    and the user's unread counter is lowered by the number of rows it changed, in the same
+    transaction as the conversation row lock. The other participant gets a read receipt on their
+    event stream once it commits. Raises Conversation.DoesNotExist when the two
+    users have no conversation.
+    """
+    user_low, user_high = _pair(user.pk, other_id)
+    with transaction.atomic():
+        conversation = Conversation.objects.select_for_update().get(user_low_id=user_low, user_high_id=user_high)
+        unread = Message.objects.filter(conversation_id=conversation.pk, receiver_id=user.pk, is_read=False)
+        if up_to_id is not None:
+            unread = unread.filter(id__lte=up_to_id)
+        marked = unread.update(is_read=True, read_at=timezone.now())
+        field = _unread_field(conversation, user.pk)
+        if marked and user_low != user_high:
+            counter = Conversation.objects.filter(pk=conversation.pk)
+            if not counter.filter(**{f'{field}__gte': marked}).update(**{field: F(field) - marked}):
+                counter.update(**{field: 0})
+        left = Conversation.objects.filter(pk=conversation.pk).values_list(field, flat=True).get()
+        if marked:
+            publish_read(conversation, user.pk, up_to_id)
+    return marked, left
@@ -0,0 +1,343 @@
+import abc
+import json
+import time
+import asyncio
+import logging
+import threading
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from asgiref.sync import sync_to_async
+from django.utils.module_loading import import_string
+from api.renderers import FastJSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = '/api/events/'
+
+# Queued in place of the events a subscriber was too slow to receive.
+OVERFLOW = object()
+
+def get_heartbeat_interval():
+    return getattr(settings, 'MOBILE_EVENTS_HEARTBEAT', 15)
+
+def get_queue_size():
+    return getattr(settings, 'MOBILE_EVENTS_QUEUE_SIZE', 100)
+
+def get_send_timeout():
+    return getattr(settings, 'MOBILE_EVENTS_SEND_TIMEOUT', 10)
+
+def get_redis_url():
+    return getattr(settings, 'MOBILE_EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+
+class Subscription:
+    """
+    One open event stream of a user, with a bounded queue owned by the event loop serving it.
+
+    When the queue is full the pending events are dropped and replaced by OVERFLOW, which ends
+    the stream with a 'reset' event; the client then catches up through the history endpoints
+    instead of the server buffering without bound for a client that does not read.
+    """
+    def __init__(self, user_id, loop=None, size=None):
+        self.user_id = user_id
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=size or get_queue_size())
+        self.overflowed = False
+
+    def deliver(self, event):
+        """
+        Queue an event. Must run on the subscription's event loop.
+        """
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+class Broker(abc.ABC):
+    """
+    Interface of the publish/subscribe backend behind the event stream.
+
+    subscribe() and unsubscribe() are called from the event loop serving the stream, publish()
+    from any thread, typically a request thread once its transaction has committed.
+    MOBILE_EVENTS_BROKER names the class to use. LocalBroker only reaches the streams served by
+    the same process; deployments with several workers use RedisBroker.
+    """
+    @abc.abstractmethod
+    def subscribe(self, user_id):
+        """
+        Open a Subscription for the user on the running event loop and return it.
+        """
+
+    @abc.abstractmethod
+    def unsubscribe(self, subscription):
+        """
+        Stop delivering events to a subscription.
+        """
+
+    @abc.abstractmethod
+    def publish(self, user_id, event):
+        """
+        Deliver an event to every open subscription of the user.
+        """
+
+class LocalBroker(Broker):
+    """
+    In-process broker: a map of user id to the user's open subscriptions. Publishing hands the
+    event to each subscription's event loop, so it never blocks on a slow client.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self.lock:
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The loop is closed; the stream is gone.
+                self.unsubscribe(subscription)
+        return len(subscriptions)
+
+    def count(self):
+        with self.lock:
+            return sum(len(subscriptions) for subscriptions in self.subscriptions.values())
+
+class RedisBroker(LocalBroker):
+    """
+    Broker shared by every worker through Redis pub/sub (MOBILE_EVENTS_REDIS_URL).
+
+    publish() sends the event to one channel that every process serving streams listens to,
+    from the process that handled the request, whatever its server. A listener thread, started
+    with the first stream of the process, hands each event to the process's own subscriptions
+    for the user as LocalBroker does, and reconnects when the connection to Redis is lost.
+    Requires the redis package.
+    """
+    channel = 'mobile:events'
+
+    def __init__(self):
+        import redis
+        super().__init__()
+        self.redis = redis.Redis.from_url(get_redis_url())
+        self.listener = None
+
+    def subscribe(self, user_id):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='event-broker', daemon=True)
+                self.listener.start()
+        return super().subscribe(user_id)
+
+    def listen(self):
+        import redis
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    try:
+                        payload = json.loads(message['data'])
+                        LocalBroker.publish(self, payload['user'], payload['event'])
+                    except Exception:
+                        logger.exception("Dropped a malformed event from the event broker.")
+            except redis.RedisError:
+                logger.warning("Lost the connection to the event broker; reconnecting.", exc_info=True)
+                time.sleep(1)
+
+    def publish(self, user_id, event):
+        return self.redis.publish(self.channel, FastJSONRenderer().render({'user': user_id, 'event': event}))
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'MOBILE_EVENTS_BROKER', 'mobile.events.LocalBroker'))()
+    return _broker
+
+def publish(user_ids, event):
+    """
+    Publish an event to users once the current transaction commits (immediately outside one).
+
+    The data is already committed by then, so a broker failure is logged rather than raised:
+    failing the request would make the client retry a write that succeeded. Clients that miss
+    the event catch up through the history endpoints.
+    """
+    def send():
+        broker = get_broker()
+        for user_id in set(user_ids):
+            try:
+                broker.publish(user_id, event)
+            except Exception:
+                logger.exception("Publishing a %r event to user %s failed.", event['event'], user_id)
+    transaction.on_commit(send)
+
+def publish_message(message):
+    """
+    Push a new message to the receiver and to the sender's other open streams.
+    """
+    publish((message.receiver_id, message.sender_id), {
+        'id': message.pk,
+        'event': 'message',
+        'data': {
+            'id': message.pk,
+            'conversation': message.conversation_id,
+            'sender': message.sender_id,
+            'receiver': message.receiver_id,
+            'body': message.body,
+            'created_at': message.created_at,
+        },
+    })
+
+def publish_read(conversation, reader_id, up_to_id):
+    """
+    Push a read receipt to the other participant of a conversation.
+    """
+    other_id = conversation.user_high_id if conversation.user_low_id == reader_id else conversation.user_low_id
+    publish((other_id,), {
+        'event': 'read',
+        'data': {'conversation': conversation.pk, 'reader': reader_id, 'up_to': up_to_id},
+    })
+
+def format_event(event):
+    """
+    Encode an event in the text/event-stream format.
+    """
+    lines = []
+    if event.get('id') is not None:
+        lines.append(b'id: %d' % event['id'])
+    lines.append(b'event: ' + event['event'].encode('utf-8'))
+    lines.append(b'data: ' + FastJSONRenderer().render(event['data']))
+    return b'\n'.join(lines) + b'\n\n'
+
+HEARTBEAT = b': heartbeat\n\n'
+RESET = format_event({'event': 'reset', 'data': {'detail': "Too many pending events; reload the conversations."}})
+
+async def authenticate(scope):
+    """
+    Return the id of the active user for the JWT in the Authorization header, or None.
+    """
+    authentication = JWTAuthentication()
+    header = dict(scope.get('headers', ())).get(b'authorization')
+    if header is None:
+        return None
+    try:
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = authentication.get_validated_token(raw_token)
+        user = await sync_to_async(get_user)(authentication, token)
+        return user.pk
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+def get_user(authentication, token):
+    """
+    Load the token's user. Streams are served outside Django's request cycle, so stale database
+    connections are closed before and after the query, as request_started/request_finished do.
+    """
+    close_old_connections()
+    try:
+        return authentication.get_user(token)
+    finally:
+        close_old_connections()
+
+class EventStreamApp:
+    """
+    ASGI application serving each authenticated user's events as Server-Sent Events:
+    'message' for new messages sent or received, 'read' for read receipts.
+
+    It runs outside Django's request/middleware stack, so an idle stream costs one coroutine and
+    one bounded queue, and no thread. Clients authenticate with the same
+    'Authorization: Bearer <token>' header as the REST API. A comment line is sent every
+    MOBILE_EVENTS_HEARTBEAT seconds to keep proxies from closing an idle stream and to detect
+    dead clients. A client that does not keep up (full queue, or a write blocked for
+    MOBILE_EVENTS_SEND_TIMEOUT seconds) is disconnected, after a 'reset' event when possible.
+    """
+    def __init__(self, broker=None):
+        self.broker = broker
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            return await self.reject(send, 405, b'{"detail":"Method not allowed."}')
+        user_id = await authenticate(scope)
+        if user_id is None:
+            return await self.reject(send, 401, b'{"detail":"Authentication credentials were not provided or are invalid."}')
+
+        broker = self.broker or get_broker()
+        subscription = broker.subscribe(user_id)
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await self.write(send, b'retry: 5000\n: connected\n\n')
+            await self.stream(subscription, disconnected, send)
+        except (asyncio.TimeoutError, OSError):
+            pass
+        finally:
+            broker.unsubscribe(subscription)
+            disconnected.cancel()
+
+    async def stream(self, subscription, disconnected, send):
+        heartbeat = get_heartbeat_interval()
+        while True:
+            event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({event, disconnected}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                event.cancel()
+                return
+            if event not in done:
+                event.cancel()
+                await self.write(send, HEARTBEAT)
+                continue
+            event = event.result()
+            if event is OVERFLOW:
+                await self.write(send, RESET, more_body=False)
+                return
+            await self.write(send, format_event(event))
+
+    async def write(self, send, body, more_body=True):
+        await asyncio.wait_for(
+            send({'type': 'http.response.body', 'body': body, 'more_body': more_body}), get_send_timeout()
+        )
+
+    async def wait_for_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    async def reject(self, send, status, body):
+        await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.db.models import Q
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from api.renderers import FastJSONRenderer
+from mobile.models import Post, Message
+from mobile.fast_serializers import FastPostSerializer, FastCompactPostSerializer, FastMessageSerializer, post_rows
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+def get_export_batch_size():
+    return getattr(settings, 'MOBILE_EXPORT_BATCH_SIZE', 500)
+
+def parse_since_id(request):
+    """
+    Read the ?since_id= query parameter (0 when absent).
+    Raises ValueError when it is not a non-negative integer.
+    """
+    value = request.query_params.get('since_id') or '0'
+    since_id = int(value)
+    if since_id < 0:
+        raise ValueError(value)
+    return since_id
+
+async def _iterate_async(chunks):
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+def stream(request, chunks):
+    """
+    Return the streaming content for an export generator.
+
+    Under ASGI, StreamingHttpResponse reads a synchronous iterator to the end before sending
+    anything, so the batches are pulled one at a time through sync_to_async instead, keeping a
+    single batch in memory there as well.
+    """
+    if isinstance(request._request, ASGIRequest):
+        return _iterate_async(chunks)
+    return chunks
+
+def export_posts(request, since_id=0, compact=False):
+    """
+    Yield every post with an id greater than ``since_id`` as newline-delimited JSON, in id order.
+
+    Posts are read in keyset batches of MOBILE_EXPORT_BATCH_SIZE (``id > last_id ORDER BY id
+    LIMIT n``) through values() queries, so only one batch is held in memory at a time on every
+    backend, including MySQL, whose driver buffers the whole result set of a single query even
+    under QuerySet.iterator(). Each line is the GetPosts representation of one post, and the id
+    of the last line received can be passed back as ?since_id= to resume an interrupted export.
+    One chunk is yielded per batch.
+    """
+    batch_size = get_export_batch_size()
+    serializer_class = FastCompactPostSerializer if compact else FastPostSerializer
+    serializer = serializer_class(context={'request': request})
+    renderer = FastJSONRenderer()
+    last_id = since_id
+    while True:
+        rows = post_rows(Post.objects.filter(pk__gt=last_id).order_by('pk')[:batch_size], compact=compact)
+        if rows:
+            yield b''.join(renderer.render(serializer.to_representation(row)) + b'\n' for row in rows)
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]['id']
+
+def export_messages(request, user, since_id=0):
+    """
+    Yield every message sent or received by ``user`` with an id greater than ``since_id``
+    as newline-delimited JSON, in id order, reading keyset batches like export_posts().
+    """
+    batch_size = get_export_batch_size()
+    serializer = FastMessageSerializer(context={'request': request})
+    renderer = FastJSONRenderer()
+    queryset = Message.objects.for_display().filter(Q(sender_id=user.pk) | Q(receiver_id=user.pk))
+    last_id = since_id
+    while True:
+        messages = list(queryset.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+        if messages:
+            yield b''.join(renderer.render(serializer.to_representation(message)) + b'\n' for message in messages)
+        if len(messages) < batch_size:
+            return
+        last_id = messages[-1].pk
@@ -0,0 +1,348 @@
+import abc
+import datetime
+from functools import partial
+from django.conf import settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.utils.encoding import filepath_to_uri
+from mobile.managers import latest_per_post, get_likes_preview_size, get_comments_preview_size
+from mobile.models import PostImage, PostLike, PostComment
+from django.core.files.storage import FileSystemStorage
+
+User = get_user_model()
+
+USER_COLUMNS = ('id', 'name', 'email', 'phone_number', 'username', 'image')
+
+def _getter(obj):
+    """
+    Field accessor for a model instance or a dict row.
+    """
+    return obj.__getitem__ if isinstance(obj, dict) else partial(getattr, obj)
+
+def _related(value):
+    """
+    The items of a prefetched relation, or the list stored in a dict row.
+    """
+    return value.all() if hasattr(value, 'all') else value
+
+def format_datetime(value, tz):
+    """
+    Render a datetime exactly like DRF's DateTimeField with the default ISO 8601 format.
+    """
+    if not value:
+        return None
+    if tz is not None:
+        value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    elif timezone.is_aware(value):
+        value = timezone.make_naive(value, datetime.timezone.utc)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+class MediaURLs:
+    """
+    Build media URLs for one request.
+
+    For FileSystemStorage the absolute URL of the storage root is resolved once, and every file
+    URL is that prefix followed by the quoted file name, which is what
+    ``request.build_absolute_uri(storage.url(name))`` returns. Names with dot segments and other
+    storage backends take the regular path.
+    """
+    def __init__(self, request=None):
+        self.request = request
+        self.prefixes = {}
+
+    def prefix(self, storage):
+        key = id(storage)
+        if key not in self.prefixes:
+            prefix = None
+            if isinstance(storage, FileSystemStorage):
+                prefix = storage.base_url
+                if self.request is not None:
+                    prefix = self.request.build_absolute_uri(prefix)
+            self.prefixes[key] = prefix
+        return self.prefixes[key]
+
+    def url(self, name, storage):
+        prefix = self.prefix(storage)
+        path = filepath_to_uri(name).lstrip('/')
+        if prefix is None or '/.' in '/' + path:
+            url = storage.url(name)
+            return self.request.build_absolute_uri(url) if self.request is not None else url
+        return prefix + path
+
+    def file_url(self, value, storage):
+        """
+        URL of an optional file field: None when no file is set, like DRF's FileField.
+        """
+        name = getattr(value, 'name', value)
+        if not name:
+            return None
+        return self.url(name, storage)
+
+class FastSerializer(abc.ABC):
+    """
+    Read-only counterpart of a ModelSerializer that renders plain dicts directly.
+
+    Accepts model instances (with their relations selected or prefetched) or dict rows. A dict
+    row uses the output field names as keys: a nested relation holds a row (or a list of rows),
+    a primary key relation holds the key and a file field holds the stored file name.
+    Nested serializers share the request's MediaURLs and timezone, so both are resolved once
+    per request however many objects are rendered.
+    """
+    def __init__(self, instance=None, many=False, context=None, media=None, tz=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.media = media or MediaURLs(self.context.get('request'))
+        self.tz = tz or (timezone.get_current_timezone() if settings.USE_TZ else None)
+        self.children = {}
+
+    def nested(self, serializer_class):
+        if serializer_class not in self.children:
+            self.children[serializer_class] = serializer_class(context=self.context, media=self.media, tz=self.tz)
+        return self.children[serializer_class]
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(obj) for obj in self.instance]
+        return self.to_representation(self.instance)
+
+    @abc.abstractmethod
+    def to_representation(self, obj):
+        """
+        Render one instance or dict row as a dict of primitive values.
+        """
+
+class FastUserSerializer(FastSerializer):
+    """
+    Renders the same output as UserSerializer.
+    """
+    image_storage = User._meta.get_field('image').storage
+
+    def to_representation(self, obj):
+        if obj is None:
+            return None
+        get = _getter(obj)
+        return {
+            'id': get('id'),
+            'name': get('name'),
+            'email': get('email'),
+            'phone_number': get('phone_number'),
+            'username': get('username'),
+            'image': self.media.file_url(get('image'), self.image_storage),
+        }
+
+class FastPostImageSerializer(FastSerializer):
+    """
+    Renders the same output as PostImageSerializer.
+    """
+    image_storage = PostImage._meta.get_field('image').storage
+
+    def to_representation(self, obj):
+        get = _getter(obj)
+        image = get('image')
+        name = getattr(image, 'name', image)
+        if not name:
+            # Same failure as PostImageSerializer, which reads obj.image.url.
+            raise ValueError("The 'image' attribute has no file associated with it.")
+        return {
+            'id': get('id'),
+            'image': self.media.url(name, self.image_storage),
+            'created_at': format_datetime(get('created_at'), self.tz),
+        }
+
+class FastPostLikeSerializer(FastSerializer):
+    """
+    Renders the same output as PostLikeSerializer.
+    """
+    def to_representation(self, obj):
+        get = _getter(obj)
+        return {
+            'id': get('id'),
+            'user': self.nested(FastUserSerializer).to_representation(get('user')),
+            'post': obj['post'] if isinstance(obj, dict) else obj.post_id,
+            'created_at': format_datetime(get('created_at'), self.tz),
+        }
+
+class FastPostCommentSerializer(FastSerializer):
+    """
+    Renders the same output as PostCommentSerializer.
+    """
+    def to_representation(self, obj):
+        get = _getter(obj)
+        return {
+            'id': get('id'),
+            'user': self.nested(FastUserSerializer).to_representation(get('user')),
+            'post': obj['post'] if isinstance(obj, dict) else obj.post_id,
+            'comment': get('comment'),
+            'created_at': format_datetime(get('created_at'), self.tz),
+            'updated_at': format_datetime(get('updated_at'), self.tz),
+        }
+
+class FastPostSerializer(FastSerializer):
+    """
+    Renders the same output as PostSerializer (without ?fields= / ?expand=).
+    """
+    include_activity = True
+
+    def to_representation(self, obj):
+        get = _getter(obj)
+        tz = self.tz
+        category = get('category')
+        if category is not None:
+            category_get = _getter(category)
+            category = {'id': category_get('id'), 'name': category_get('name'), 'slug': category_get('slug')}
+        images = self.nested(FastPostImageSerializer)
+        data = {
+            'id': get('id'),
+            'user': self.nested(FastUserSerializer).to_representation(get('user')),
+            'title': get('title'),
+            'category': category,
+            'description': get('description'),
+            'created_at': format_datetime(get('created_at'), tz),
+            'updated_at': format_datetime(get('updated_at'), tz),
+            'images': [images.to_representation(image) for image in _related(get('images'))],
+        }
+        if self.include_activity:
+            likes = self.nested(FastPostLikeSerializer)
+            comments = self.nested(FastPostCommentSerializer)
+            data['likes'] = [likes.to_representation(like) for like in _related(get('likes'))]
+            data['comments'] = [comments.to_representation(comment) for comment in _related(get('comments'))]
+        data['like_count'] = get('like_count')
+        data['comment_count'] = get('comment_count')
+        return data
+
+class FastCompactPostSerializer(FastPostSerializer):
+    """
+    Renders the same output as CompactPostSerializer (without ?fields= / ?expand=).
+    """
+    include_activity = False
+
+class FastMessageSerializer(FastSerializer):
+    """
+    Renders the same output as MessageSerializer (without ?fields= / ?expand=).
+    """
+    def to_representation(self, obj):
+        get = _getter(obj)
+        users = self.nested(FastUserSerializer)
+        return {
+            'id': get('id'),
+            'sender': users.to_representation(get('sender')),
+            'receiver': users.to_representation(get('receiver')),
+            'body': get('body'),
+            'created_at': format_datetime(get('created_at'), self.tz),
+            'updated_at': format_datetime(get('updated_at'), self.tz),
+            'is_read': get('is_read'),
+            'read_at': format_datetime(get('read_at'), self.tz),
+        }
+
+def _user_row(row, prefix):
+    if row[f'{prefix}id'] is None:
+        return None
+    return {name: row[f'{prefix}{name}'] for name in USER_COLUMNS}
+
+def post_rows(posts, compact=False):
+    """
+    Load the dict rows FastPostSerializer renders for a queryset of posts, using values() queries only.
+
+    Runs one query for the posts with their author and category, one for the images and,
+    unless ``compact``, one each for the likes and comments with their authors. Like
+    for_feed(), only the most recent likes and comments of each post are loaded.
+    """
+    user_columns = [f'user__{name}' for name in USER_COLUMNS]
+    rows = []
+    by_id = {}
+    for row in posts.values('id', 'title', 'description', 'created_at', 'updated_at', 'like_count',
+                            'comment_count', 'category__id', 'category__name', 'category__slug', *user_columns):
+        post = {
+            'id': row['id'],
+            'user': _user_row(row, 'user__'),
+            'title': row['title'],
+            'category': {'id': row['category__id'], 'name': row['category__name'], 'slug': row['category__slug']},
+            'description': row['description'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'images': [],
+            'likes': [],
+            'comments': [],
+            'like_count': row['like_count'],
+            'comment_count': row['comment_count'],
+        }
+        rows.append(post)
+        by_id[post['id']] = post
+
+    ids = list(by_id)
+    for image in PostImage.objects.filter(post_id__in=ids).values('id', 'post_id', 'image', 'created_at'):
+        by_id[image.pop('post_id')]['images'].append(image)
+    if compact:
+        return rows
+
+    likes = latest_per_post(PostLike.objects.filter(post_id__in=ids), get_likes_preview_size())
+    for like in likes.values('id', 'post_id', 'created_at', *user_columns):
+        by_id[like['post_id']]['likes'].append({
+            'id': like['id'], 'user': _user_row(like, 'user__'), 'post': like['post_id'], 'created_at': like['created_at'],
+        })
+    comments = latest_per_post(PostComment.objects.filter(post_id__in=ids), get_comments_preview_size())
+    for comment in comments.values('id', 'post_id', 'comment', 'created_at', 'updated_at', *user_columns):
+        by_id[comment['post_id']]['comments'].append({
+            'id': comment['id'], 'user': _user_row(comment, 'user__'), 'post': comment['post_id'],
+            'comment': comment['comment'], 'created_at': comment['created_at'], 'updated_at': comment['updated_at'],
+        })
+    return rows
+
+def serialize_posts(posts, request, many=False, compact=False, fields=None, expand=None):
+    """
+    Render posts for a feed-shaped response.
+
+    Uses the fast serializers unless ?fields= or ?expand= was given, in which case the
+    DRF serializers (and DynamicFieldsMixin) take over.
+    """
+    from mobile.serializers import PostSerializer, CompactPostSerializer
+
+    context = {'request': request}
+    if fields is None and expand is None:
+        serializer_class = FastCompactPostSerializer if compact else FastPostSerializer
+        return serializer_class(posts, many=many, context=context).data
+    serializer_class = CompactPostSerializer if compact else PostSerializer
+    return serializer_class(posts, many=many, fields=fields, expand=expand, context=context).data
+
+def serialize_users(users, request, many=False, fields=None):
+    """
+    Render users for a list-shaped response, with the fast serializer unless ?fields= was given.
+    """
+    from mobile.serializers import UserSerializer
+
+    context = {'request': request}
+    if fields is None:
+        return FastUserSerializer(users, many=many, context=context).data
+    return UserSerializer(users, many=many, fields=fields, context=context).data
+
+def serialize_conversations(conversations, request, fields=None, expand=None):
+    """
+    Render inbox conversations from the requester's point of view. The last message is
+    rendered by the DRF MessageSerializer when ?fields= or ?expand= was given.
+    """
+    from mobile.serializers import MessageSerializer
+
+    context = {'request': request}
+    viewer_id = request.user.pk
+    users = FastUserSerializer(context=context)
+    messages = [conversation.last_message for conversation in conversations if conversation.last_message is not None]
+    if fields is None and expand is None:
+        rendered = FastMessageSerializer(messages, many=True, context=context, media=users.media, tz=users.tz).data
+    else:
+        rendered = MessageSerializer(messages, many=True, fields=fields, expand=expand, context=context).data
+    rendered = dict(zip([message.pk for message in messages], rendered))
+    return [
+        {
+            'id': conversation.pk,
+            'user': users.to_representation(conversation.other_user(viewer_id)),
+            'last_message': rendered.get(conversation.last_message_id),
+            'last_activity_at': format_datetime(conversation.last_activity_at, users.tz),
+            'unread_count': conversation.unread_count(viewer_id),
+        }
+        for conversation in conversations
+    ]
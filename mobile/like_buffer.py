@@ -0,0 +1,203 @@
+import time
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.utils import timezone
+from mobile.cache import bump_post_version
+from mobile.models import Post, PostLike, PendingLike
+from django.db.models import Q, F, Max, Sum, Case, When, Count, Value
+from django.db import transaction, IntegrityError, close_old_connections
+
+logger = logging.getLogger(__name__)
+
+def is_enabled():
+    return getattr(settings, 'MOBILE_LIKE_BUFFER', False)
+
+def get_flush_interval():
+    return getattr(settings, 'MOBILE_LIKE_BUFFER_INTERVAL', 1.0)
+
+def get_flush_batch_size():
+    return getattr(settings, 'MOBILE_LIKE_BUFFER_BATCH_SIZE', 1000)
+
+def get_max_attempts():
+    return getattr(settings, 'MOBILE_LIKE_BUFFER_MAX_ATTEMPTS', 5)
+
+class LikeBuffer:
+    """
+    Write-behind flusher of the like toggles journaled in mobile.PendingLike.
+
+    The journal lives in the database, so every worker sees the same pending state, and toggles
+    are coalesced per (user id, post id) into the state the user asked for last whichever worker
+    received them: a like followed by an unlike leaves one entry that writes nothing. Each
+    process that journals a toggle starts a daemon thread that flushes the whole journal every
+    MOBILE_LIKE_BUFFER_INTERVAL seconds, and once more at exit; concurrent flushes of different
+    workers are serialized by the post row locks and write the same final state. Nothing is
+    lost when a process is killed, the next flush of any worker writes its entries.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='like-buffer', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            time.sleep(get_flush_interval())
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing the like buffer failed.")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """
+        Write the journaled toggles to mobile.PostLike and return the number of entries written.
+
+        Entries are written in batches of MOBILE_LIKE_BUFFER_BATCH_SIZE, one transaction each.
+        When a batch fails its entries are written one at a time instead, so one failing entry
+        does not hold back the others; it is retried by the following flushes and dropped after
+        MOBILE_LIKE_BUFFER_MAX_ATTEMPTS failures.
+        """
+        batch_size = get_flush_batch_size()
+        written = 0
+        last_pk = 0
+        while True:
+            batch = list(PendingLike.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return written
+            last_pk = batch[-1]
+            try:
+                with transaction.atomic():
+                    written += self.write(batch)
+            except Exception:
+                logger.warning("Writing a batch of %d buffered likes failed; writing them one at a time.", len(batch), exc_info=True)
+                for pk in batch:
+                    written += self.write_one(pk)
+
+    def write_one(self, pk):
+        try:
+            with transaction.atomic():
+                return self.write([pk])
+        except Exception:
+            entry = PendingLike.objects.filter(pk=pk)
+            if entry.filter(attempts__gte=get_max_attempts() - 1).delete()[0]:
+                logger.exception("Dropped buffered like %d after %d failed attempts.", pk, get_max_attempts())
+            else:
+                logger.exception("Writing buffered like %d failed; it will be retried.", pk)
+                entry.update(attempts=F('attempts') + 1)
+            return 0
+
+    def write(self, pks):
+        """
+        Write the journal entries ``pks`` and remove them from the journal, inside the caller's transaction.
+
+        The affected posts are locked first (in primary key order), which serializes the write
+        with direct toggles and with other flushes of the same posts. The entries are then read
+        again under the locks, so a flush never writes a state older than one another flush
+        already wrote. The likes that already exist are read in one query, the missing ones
+        inserted with one bulk INSERT, the unwanted ones deleted with one DELETE per post, and
+        each post's like_count is adjusted by the exact difference. An entry toggled again
+        meanwhile stays in the journal for the next flush.
+        """
+        post_ids = sorted(set(PendingLike.objects.filter(pk__in=pks).values_list('post_id', flat=True)))
+        posts = list(Post.objects.select_for_update().filter(pk__in=post_ids).order_by('pk').values_list('pk', flat=True))
+        entries = list(
+            PendingLike.objects.select_for_update().filter(pk__in=pks, post_id__in=posts)
+            .values_list('pk', 'user_id', 'post_id', 'liked', 'version')
+        )
+        if not entries:
+            return 0
+        user_ids = {user_id for _, user_id, _, _, _ in entries}
+        existing = set(
+            PostLike.objects.filter(post_id__in=posts, user_id__in=user_ids).values_list('user_id', 'post_id')
+        )
+
+        to_insert = []
+        to_delete = defaultdict(list)
+        for _, user_id, post_id, liked, _ in entries:
+            if liked and (user_id, post_id) not in existing:
+                to_insert.append(PostLike(user_id=user_id, post_id=post_id))
+            elif not liked and (user_id, post_id) in existing:
+                to_delete[post_id].append(user_id)
+
+        deltas = defaultdict(int)
+        PostLike.objects.bulk_create(to_insert, batch_size=1000)
+        for like in to_insert:
+            deltas[like.post_id] += 1
+        for post_id, users in to_delete.items():
+            PostLike.objects.filter(post_id=post_id, user_id__in=users).delete()
+            deltas[post_id] -= len(users)
+
+        for post_id, delta in deltas.items():
+            if delta:
+                Post.objects.adjust_counter(post_id, 'like_count', delta)
+            bump_post_version(post_id)
+
+        written = Q()
+        for pk, _, _, _, version in entries:
+            written |= Q(pk=pk, version=version)
+        PendingLike.objects.filter(written).delete()
+        return len(entries)
+
+buffer = LikeBuffer()
+
+def toggle_like_buffered(user, post_id):
+    """
+    Toggle a like through the write-behind buffer and return whether the post is now liked.
+
+    The toggle flips the user's journal entry for the post with one UPDATE. Without an entry
+    the current state is the database row, read once the UPDATE found nothing (so after any
+    flush that just removed the entry), and a new entry is inserted with the opposite state.
+    The journal is shared by every worker, so the user's own reads on any worker (is_liked,
+    conditional GET validators) reflect the toggle before it is written.
+    Raises Post.DoesNotExist when there is no such post.
+    """
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Post.DoesNotExist("Post not found.")
+
+    entry = PendingLike.objects.filter(user_id=user.pk, post_id=post_id)
+    flip = {
+        'liked': Case(When(liked=True, then=Value(False)), default=Value(True)),
+        'version': F('version') + 1,
+        'attempts': 0,
+        'updated_at': timezone.now(),
+    }
+    with transaction.atomic():
+        if entry.update(**flip):
+            liked = entry.values_list('liked', flat=True).get()
+        else:
+            liked = not PostLike.objects.filter(user_id=user.pk, post_id=post_id).exists()
+            try:
+                with transaction.atomic():
+                    PendingLike.objects.create(user_id=user.pk, post_id=post_id, liked=liked)
+            except IntegrityError:
+                # Created by a concurrent toggle of the same user.
+                entry.update(**flip)
+                liked = entry.values_list('liked', flat=True).get()
+    buffer.start()
+    return liked
+
+def get_pending_likes(user_id, post_ids):
+    """
+    Map post id -> liked for the user's toggles that may not have been flushed yet.
+    """
+    if not is_enabled() or not post_ids:
+        return {}
+    return dict(PendingLike.objects.filter(user_id=user_id, post_id__in=post_ids).values_list('post_id', 'liked'))
+
+def get_viewer_version(user):
+    """
+    A value that changes with every buffered toggle of the user, for conditional GET validators.
+    """
+    if not is_enabled() or not user.is_authenticated:
+        return None
+    state = PendingLike.objects.filter(user_id=user.pk).aggregate(count=Count('id'), max_id=Max('id'), versions=Sum('version'))
+    return tuple(sorted(state.items()))
@@ -0,0 +1,105 @@
+import timeit
+import decimal
+from datetime import timedelta
+from django.utils import timezone
+from api.renderers import FastJSONRenderer
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    """
+    Benchmark FastJSONRenderer against DRF's JSONRenderer.
+
+    Renders feed-shaped payloads (posts with a nested author, category, images, likes and
+    comments, as produced by PostSerializer) and a conversation-shaped payload (messages with
+    nested sender and receiver, as produced by MessageSerializer). The raw payloads also carry
+    datetimes, Decimals and lazy strings so the fallback path is exercised. Before timing, the
+    output of both renderers is compared byte for byte.
+    """
+    help = "Compare the JSON renderers on realistic GetPosts / MessageHistoryView payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=50, help="Posts per feed page.")
+        parser.add_argument('--likes', type=int, default=20, help="Likes and comments per post.")
+        parser.add_argument('--messages', type=int, default=500, help="Messages in the conversation payload.")
+        parser.add_argument('--iterations', type=int, default=50, help="Renders per timing run.")
+
+    def user(self, i):
+        return {
+            'id': i, 'name': f"User Ñame {i}", 'email': f"user{i}@example.com",
+            'phone_number': f"+2507{i:08d}", 'username': f"user-{i}",
+            'image': f"https://api.example.com/media/users/user_{i}.jpeg",
+        }
+
+    def stamp(self, minutes):
+        return (self.now - timedelta(minutes=minutes)).isoformat().replace('+00:00', 'Z')
+
+    def feed_payload(self, posts, likes):
+        data = []
+        for i in range(posts):
+            data.append({
+                'id': i, 'user': self.user(i), 'title': f"Post title {i} — with unicode ✓",
+                'category': {'id': i % 7, 'name': f"Category {i % 7}", 'slug': f"category-{i % 7}"},
+                'description': "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4,
+                'created_at': self.stamp(i), 'updated_at': self.stamp(i),
+                'images': [
+                    {'id': i * 3 + k, 'image': f"https://api.example.com/media/posts/post_{i}_{k}.jpg", 'created_at': self.stamp(i)}
+                    for k in range(3)
+                ],
+                'likes': [
+                    {'id': i * likes + k, 'user': self.user(k), 'post': i, 'created_at': self.stamp(k)}
+                    for k in range(likes)
+                ],
+                'comments': [
+                    {'id': i * likes + k, 'user': self.user(k), 'post': i, 'comment': f"Nice post #{k}!",
+                     'created_at': self.stamp(k), 'updated_at': self.stamp(k)}
+                    for k in range(likes)
+                ],
+                'like_count': likes, 'comment_count': likes,
+            })
+        return {'detail': "Posts retrieved successfully.", 'data': data, 'next': "eyJwIjpbXX0", 'prev': None}
+
+    def message_payload(self, messages):
+        data = [
+            {'id': i, 'sender': self.user(i % 2), 'receiver': self.user(1 - i % 2), 'body': f"Message body {i}",
+             'created_at': self.stamp(i), 'updated_at': self.stamp(i), 'is_read': bool(i % 3), 'read_at': None}
+            for i in range(messages)
+        ]
+        return {'detail': "Conversation history retrieved successfully.", 'count': messages, 'messages': data}
+
+    def raw_payload(self, posts):
+        # Values a view may hand to the renderer directly, bypassing serializer fields.
+        return {
+            'detail': gettext_lazy("Posts retrieved successfully."),
+            'data': [
+                {'id': i, 'created_at': self.now - timedelta(minutes=i), 'price': decimal.Decimal('12.50'),
+                 'duration': timedelta(seconds=i), 'label': gettext_lazy("Post")}
+                for i in range(posts)
+            ],
+        }
+
+    def handle(self, *args, **options):
+        self.now = timezone.now()
+        payloads = [
+            ("GetPosts page", self.feed_payload(options['posts'], options['likes'])),
+            ("MessageHistoryView", self.message_payload(options['messages'])),
+            ("Raw datetimes/Decimals/lazy strings", self.raw_payload(options['posts'])),
+        ]
+        baseline = JSONRenderer()
+        fast = FastJSONRenderer()
+        iterations = options['iterations']
+
+        for label, payload in payloads:
+            expected = baseline.render(payload)
+            actual = fast.render(payload)
+            if expected != actual:
+                raise CommandError(f"{label}: FastJSONRenderer output differs from JSONRenderer.")
+
+            slow_time = min(timeit.repeat(lambda: baseline.render(payload), number=iterations, repeat=3)) / iterations
+            fast_time = min(timeit.repeat(lambda: fast.render(payload), number=iterations, repeat=3)) / iterations
+            self.stdout.write(
+                f"{label}: {len(expected) / 1024:.1f} KiB | JSONRenderer {slow_time * 1000:.3f} ms | "
+                f"FastJSONRenderer {fast_time * 1000:.3f} ms | {slow_time / fast_time:.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("Outputs are identical."))
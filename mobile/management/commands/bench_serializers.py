@@ -0,0 +1,103 @@
+import timeit
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from base.models import Category
+from django.test import RequestFactory
+from django.contrib.auth import get_user_model
+from rest_framework.renderers import JSONRenderer
+from mobile.serializers import PostSerializer, CompactPostSerializer
+from django.core.management.base import BaseCommand
+from mobile.models import Post, PostImage, PostLike, PostComment
+from mobile.fast_serializers import FastPostSerializer, FastCompactPostSerializer, post_rows
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    """
+    Benchmark the fast read-only serializers against the DRF serializers.
+
+    Seeds a feed of posts with images, likes and comments inside a transaction that is rolled
+    back at the end, so no data is left behind, then times PostSerializer /
+    CompactPostSerializer against the fast serializers fed prefetched instances and values() rows.
+    That their output is identical is checked by mobile.tests.FastSerializerParityTests.
+    """
+    help = "Time the fast feed serializers against PostSerializer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=50, help="Posts in the seeded feed.")
+        parser.add_argument('--likes', type=int, default=20, help="Likes and comments per post.")
+        parser.add_argument('--iterations', type=int, default=20, help="Renders per timing run.")
+        parser.add_argument('--host', default='api.example.com', help="Host used to build absolute media URLs.")
+
+    def seed(self, posts, likes):
+        User = get_user_model()
+        now = timezone.now()
+        users = User.objects.bulk_create([
+            User(
+                name=f"Bench Ñame {i}", email=f"bench-{i}@example.com", phone_number=f"+2509{i:08d}",
+                username=f"bench-user-{i}", image='' if i == 0 else f"users/bench user ñ {i} (1).jpeg",
+            )
+            for i in range(max(likes, 2))
+        ])
+        category = Category.objects.create(name="Bench category")
+        created = Post.objects.bulk_create([
+            Post(
+                user=None if i == 0 else users[i % len(users)], category=category, title=f"Bench post {i} — ✓",
+                description="Lorem ipsum dolor sit amet. " * 4, like_count=likes, comment_count=likes,
+            )
+            for i in range(posts)
+        ])
+        Post.objects.filter(pk__in=[post.pk for post in created]).update(created_at=now, updated_at=now)
+        PostImage.objects.bulk_create([
+            PostImage(post=post, image=f"posts/bench post {post.pk}#{k}?.jpg")
+            for post in created for k in range(3)
+        ])
+        PostLike.objects.bulk_create([PostLike(post=post, user=users[k]) for post in created for k in range(likes)])
+        PostComment.objects.bulk_create([
+            PostComment(post=post, user=users[k], comment=f"Nice post #{k}!") for post in created for k in range(likes)
+        ])
+        return [post.pk for post in created]
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        ids = self.seed(options['posts'], options['likes'])
+        request = RequestFactory().get('/api/mobile/posts/', HTTP_HOST=options['host'])
+        context = {'request': request}
+        renderer = JSONRenderer()
+        iterations = options['iterations']
+
+        cases = []
+        for compact, drf_class, fast_class in ((False, PostSerializer, FastPostSerializer),
+                                               (True, CompactPostSerializer, FastCompactPostSerializer)):
+            queryset = Post.objects.filter(pk__in=ids).order_by('-created_at', '-id')
+            posts = list(queryset.for_feed(compact=compact))
+            rows = post_rows(queryset, compact=compact)
+            label = "CompactPostSerializer" if compact else "PostSerializer"
+            cases.append((f"{label} page", lambda c=drf_class, p=posts: c(p, many=True, context=context).data,
+                          lambda c=fast_class, p=posts: c(p, many=True, context=context).data,
+                          lambda c=fast_class, r=rows: c(r, many=True, context=context).data))
+            cases.append((f"{label} detail", lambda c=drf_class, p=posts: c(p[-1], context=context).data,
+                          lambda c=fast_class, p=posts: c(p[-1], context=context).data,
+                          lambda c=fast_class, r=rows: c(r[-1], context=context).data))
+
+        for label, drf, fast_instances, fast_rows in cases:
+            size = len(renderer.render(drf()))
+
+            def timed(build):
+                return min(timeit.repeat(build, number=iterations, repeat=3)) / iterations * 1000
+
+            drf_time, instance_time, row_time = timed(drf), timed(fast_instances), timed(fast_rows)
+            self.stdout.write(
+                f"{label}: {size / 1024:.1f} KiB | DRF {drf_time:.3f} ms | "
+                f"fast (instances) {instance_time:.3f} ms {drf_time / instance_time:.1f}x | "
+                f"fast (rows) {row_time:.3f} ms {drf_time / row_time:.1f}x"
+            )
@@ -0,0 +1,23 @@
+import time
+from mobile.suggestions import refresh_suggestions
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    """
+    Compute "people you may know" suggestions from the follow graph.
+
+    By default only the users whose follows changed since the last run are recomputed; run it
+    every few minutes from cron. Run it with --full periodically (e.g. nightly) as well: a
+    user's suggestions also change when the people they follow follow someone new.
+    """
+    help = "Recompute FollowSuggestion rows from the Follow graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute every user instead of the stale ones.")
+        parser.add_argument('--size', type=int, default=None, help="Suggestions kept per user (MOBILE_SUGGESTIONS_SIZE by default).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users, written = refresh_suggestions(full=options['full'], size=options['size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Refreshed suggestions of {users} users ({written} rows) in {elapsed:.2f}s."))
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from mobile.timeline import backfill_timeline
+from mobile.models import Follow, TimelineEntry
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    """
+    Materialize home timelines from the existing Follow graph.
+
+    For every follow relationship the followed user's recent posts are backfilled into the
+    follower's timeline, and every user's own recent posts are added to their own timeline.
+    Inserts ignore conflicts, so the command can be re-run safely.
+    """
+    help = "Backfill TimelineEntry rows for existing follow relationships."
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        written = 0
+        for user in User.objects.filter(post__isnull=False).distinct().iterator():
+            written += backfill_timeline(user.pk, user)
+        for follow in Follow.objects.select_related('following').order_by('pk').iterator():
+            written += backfill_timeline(follow.follower_id, follow.following)
+        self.stdout.write(self.style.SUCCESS(f"Wrote up to {written} timeline entries ({TimelineEntry.objects.count()} in total)."))
@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.models import Count
+from django.contrib.auth import get_user_model
+from mobile.models import Post, PostLike, PostComment, Follow
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    """
+    Recompute the denormalized counters on mobile.Post and account.User.
+
+    Rows are walked in primary key order, one batch at a time. For each batch the real
+    counts are fetched with one grouped query per counter and only the rows whose stored
+    counters have drifted are written back, with a single bulk_update per batch.
+    """
+    help = "Recompute Post like/comment counts and User follower/following counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of rows to reconcile per batch.")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing any changes.")
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+
+        self.reconcile(Post, {
+            'like_count': (PostLike, 'post_id'),
+            'comment_count': (PostComment, 'post_id'),
+        })
+        self.reconcile(get_user_model(), {
+            'follower_count': (Follow, 'following_id'),
+            'following_count': (Follow, 'follower_id'),
+        })
+
+    def reconcile(self, model, counters):
+        """
+        Reconcile the given counter fields of ``model``.
+        ``counters`` maps each counter field to the (related model, foreign key column) it counts.
+        """
+        last_id = 0
+        checked = 0
+        repaired = 0
+        fields = list(counters)
+
+        while True:
+            batch = list(model.objects.filter(pk__gt=last_id).order_by('pk').only('pk', *fields)[:self.batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            ids = [row.pk for row in batch]
+
+            actual = {}
+            for field, (related_model, column) in counters.items():
+                actual[field] = dict(
+                    related_model.objects.filter(**{f'{column}__in': ids}).order_by()
+                    .values_list(column).annotate(total=Count('pk'))
+                )
+
+            drifted = []
+            for row in batch:
+                changed = False
+                for field in fields:
+                    value = actual[field].get(row.pk, 0)
+                    if getattr(row, field) != value:
+                        setattr(row, field, value)
+                        changed = True
+                if changed:
+                    drifted.append(row)
+
+            if drifted and not self.dry_run:
+                with transaction.atomic():
+                    model.objects.bulk_update(drifted, fields)
+
+            checked += len(batch)
+            repaired += len(drifted)
+
+        verb = "would be repaired" if self.dry_run else "repaired"
+        label = model._meta.verbose_name_plural
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} {label}, {repaired} {verb}."))
@@ -0,0 +1,102 @@
+from django.db import models
+from django.conf import settings
+from django.db.models import F, Window, Prefetch
+from django.db.models.functions import RowNumber
+
+def _wants(name, fields, expand):
+    """
+    Whether a relation is rendered in full for the given ?fields= / ?expand= selections.
+    """
+    return (fields is None or name in fields) and (expand is None or name in expand)
+
+def _only_columns(model, fields, always=('id',)):
+    """
+    The concrete columns to load for a ?fields= selection.
+    """
+    concrete = {field.name for field in model._meta.concrete_fields}
+    return set(always) | (set(fields) & concrete)
+
+def get_likes_preview_size():
+    return getattr(settings, 'MOBILE_LIKES_PREVIEW_SIZE', 3)
+
+def get_comments_preview_size():
+    return getattr(settings, 'MOBILE_COMMENTS_PREVIEW_SIZE', 3)
+
+def latest_per_post(queryset, size):
+    """
+    Limit ``queryset`` to the ``size`` newest rows (by created_at, id) of each post.
+
+    The rank is a ROW_NUMBER() window partitioned by post, so used as a prefetch it loads
+    the previews of a whole page of posts in a single query.
+    """
+    rank = Window(RowNumber(), partition_by=F('post_id'), order_by=(F('created_at').desc(), F('id').desc()))
+    return queryset.annotate(preview_rank=rank).filter(preview_rank__lte=size).order_by('-created_at', '-id')
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self, compact=False, fields=None, expand=None):
+        """
+        Load everything PostSerializer renders in a fixed number of queries.
+
+        The author and category are joined in, while images, likes and comments are
+        prefetched together with their own authors. The query count is therefore the
+        same for one post or a full page, regardless of how many likes or comments exist.
+        Only the MOBILE_LIKES_PREVIEW_SIZE most recent likes and MOBILE_COMMENTS_PREVIEW_SIZE
+        most recent comments of each post are loaded, each with a single window-function
+        query for the whole page (see latest_per_post).
+
+        With compact=True the likes and comments are not loaded at all, for
+        representations that only need the denormalized counters. The optional
+        fields/expand sets (see DynamicFieldsMixin) drop the joins, prefetches and
+        columns of everything that will not be rendered.
+        """
+        from mobile.models import PostLike, PostComment
+
+        queryset = self
+        joins = [name for name in ('user', 'category') if _wants(name, fields, expand)]
+        if joins:
+            queryset = queryset.select_related(*joins)
+        if _wants('images', fields, expand):
+            queryset = queryset.prefetch_related('images')
+        if not compact and _wants('likes', fields, expand):
+            likes = latest_per_post(PostLike.objects.select_related('user'), get_likes_preview_size())
+            queryset = queryset.prefetch_related(Prefetch('likes', queryset=likes))
+        if not compact and _wants('comments', fields, expand):
+            comments = latest_per_post(PostComment.objects.select_related('user'), get_comments_preview_size())
+            queryset = queryset.prefetch_related(Prefetch('comments', queryset=comments))
+        if fields is not None:
+            # created_at positions the keyset cursors and user_id feeds the viewer-relative fields.
+            queryset = queryset.only(*_only_columns(self.model, fields, always=('id', 'created_at', 'user')))
+        return queryset
+
+    def adjust_counter(self, pk, field, delta):
+        """
+        Atomically add ``delta`` to a denormalized counter column of one post.
+
+        The arithmetic happens in the database through an F() expression, so concurrent
+        requests never overwrite each other. Decrements are skipped when they would push
+        the counter below zero; the reconcile_counters command repairs any such drift.
+        """
+        queryset = self.filter(pk=pk)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        return queryset.update(**{field: F(field) + delta})
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
+    pass
+
+class MessageQuerySet(models.QuerySet):
+    def for_display(self, fields=None, expand=None):
+        """
+        Join the sender and receiver that MessageSerializer renders, skipping whatever
+        the fields/expand selections leave out.
+        """
+        queryset = self
+        joins = [name for name in ('sender', 'receiver') if _wants(name, fields, expand)]
+        if joins:
+            queryset = queryset.select_related(*joins)
+        if fields is not None:
+            queryset = queryset.only(*_only_columns(self.model, fields, always=('id', 'created_at')))
+        return queryset
+
+class MessageManager(models.Manager.from_queryset(MessageQuerySet)):
+    pass
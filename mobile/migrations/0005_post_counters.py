@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-18 10:25
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('mobile', 'Post')
+    PostLike = apps.get_model('mobile', 'PostLike')
+    PostComment = apps.get_model('mobile', 'PostComment')
+
+    def count_of(model):
+        counts = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Post.objects.update(like_count=count_of(PostLike), comment_count=count_of(PostComment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mobile', '0004_post_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Denormalized number of comments on the post.'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Denormalized number of likes on the post.'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
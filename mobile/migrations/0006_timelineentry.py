@@ -0,0 +1,47 @@
+# Generated by Django 5.0 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Follow = apps.get_model('mobile', 'Follow')
+
+    def count_of(field):
+        counts = Follow.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    User.objects.update(follower_count=count_of('following'), following_count=count_of('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mobile', '0005_post_counters'),
+        ('account', '0002_user_follow_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_created_at', models.DateTimeField(help_text='The creation time of the post, denormalized for ordering.')),
+                ('author', models.ForeignKey(help_text='The author of the post.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(help_text='The post delivered to the timeline.', on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='mobile.post')),
+                ('user', models.ForeignKey(help_text='The user whose home timeline contains the post.', on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Timeline Entry',
+                'verbose_name_plural': 'Timeline Entries',
+                'indexes': [models.Index(fields=['user', 'post_created_at', 'post'], name='mobile_timeline_user_idx'), models.Index(fields=['user', 'author'], name='mobile_timeline_author_idx')],
+                'unique_together': {('user', 'post')},
+            },
+        ),
+        migrations.RunPython(backfill_follow_counters, migrations.RunPython.noop),
+    ]
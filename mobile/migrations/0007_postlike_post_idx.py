@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 10:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mobile', '0006_timelineentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postlike',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='mobile_postlike_post_idx'),
+        ),
+    ]
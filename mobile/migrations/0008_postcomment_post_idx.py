@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 10:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mobile', '0007_postlike_post_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='mobile_postcomment_post_idx'),
+        ),
+    ]
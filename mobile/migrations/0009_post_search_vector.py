@@ -0,0 +1,56 @@
+from django.db import migrations
+
+# The search_vector column only exists on PostgreSQL and is not declared on the Post model:
+# it is filled by a trigger and only read through mobile.search. Other backends use the
+# in-process index in mobile.search instead.
+FORWARD_SQL = [
+    "ALTER TABLE mobile_post ADD COLUMN search_vector tsvector",
+    """
+    CREATE FUNCTION mobile_post_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER mobile_post_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON mobile_post
+    FOR EACH ROW EXECUTE FUNCTION mobile_post_search_vector_update()
+    """,
+    """
+    UPDATE mobile_post SET search_vector =
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    """,
+    "CREATE INDEX mobile_post_search_idx ON mobile_post USING GIN (search_vector)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS mobile_post_search_idx",
+    "DROP TRIGGER IF EXISTS mobile_post_search_vector_trigger ON mobile_post",
+    "DROP FUNCTION IF EXISTS mobile_post_search_vector_update()",
+    "ALTER TABLE mobile_post DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mobile', '0008_postcomment_post_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(FORWARD_SQL), run_on_postgresql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0 on 2026-10-18 10:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_user_prefix_indexes'),
+        ('mobile', '0010_follow_list_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionRefresh',
+            fields=[
+                ('user', models.OneToOneField(help_text='The user whose suggestions are stale.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('marked_at', models.DateTimeField(auto_now=True, help_text="When the user's follows last changed.")),
+            ],
+            options={
+                'verbose_name': 'Suggestion Refresh',
+                'verbose_name_plural': 'Suggestion Refreshes',
+            },
+        ),
+        migrations.CreateModel(
+            name='FollowSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mutual_count', models.PositiveIntegerField(help_text='Number of followed users who follow the suggested user.')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the suggestion was computed.')),
+                ('suggested', models.ForeignKey(help_text='The suggested user.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(help_text='The user the suggestion is for.', on_delete=django.db.models.deletion.CASCADE, related_name='follow_suggestions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Follow Suggestion',
+                'verbose_name_plural': 'Follow Suggestions',
+                'indexes': [models.Index(fields=['user', '-mutual_count', 'suggested'], name='mobile_suggestion_user_idx')],
+                'unique_together': {('user', 'suggested')},
+            },
+        ),
+    ]
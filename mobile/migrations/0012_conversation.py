@@ -0,0 +1,60 @@
+# Generated by Django 5.0 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversations(apps, schema_editor):
+    Message = apps.get_model('mobile', 'Message')
+    Conversation = apps.get_model('mobile', 'Conversation')
+
+    # One pass over the messages in id order; the last message seen for a pair is its latest.
+    conversations = {}
+    messages = Message.objects.order_by('id').values_list('id', 'sender_id', 'receiver_id', 'created_at', 'is_read')
+    for message_id, sender_id, receiver_id, created_at, is_read in messages.iterator(chunk_size=2000):
+        user_low, user_high = sorted((sender_id, receiver_id))
+        conversation = conversations.get((user_low, user_high))
+        if conversation is None:
+            conversation = conversations[(user_low, user_high)] = Conversation(
+                user_low_id=user_low, user_high_id=user_high, last_activity_at=created_at,
+            )
+        if created_at >= conversation.last_activity_at:
+            conversation.last_message_id, conversation.last_activity_at = message_id, created_at
+        if not is_read and sender_id != receiver_id:
+            if receiver_id == user_low:
+                conversation.unread_low += 1
+            else:
+                conversation.unread_high += 1
+    Conversation.objects.bulk_create(conversations.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mobile', '0011_follow_suggestions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_activity_at', models.DateTimeField(help_text='When the most recent message was sent.')),
+                ('unread_low', models.PositiveIntegerField(default=0, help_text='Number of messages the lower-id participant has not read.')),
+                ('unread_high', models.PositiveIntegerField(default=0, help_text='Number of messages the higher-id participant has not read.')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the conversation started.')),
+                ('last_message', models.ForeignKey(blank=True, help_text='The most recent message of the conversation.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='mobile.message')),
+                ('user_high', models.ForeignKey(help_text='The participant with the higher user id.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_low', models.ForeignKey(help_text='The participant with the lower user id.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Conversation',
+                'verbose_name_plural': 'Conversations',
+                'indexes': [models.Index(fields=['user_low', 'last_activity_at', 'id'], name='mobile_conversation_low_idx'), models.Index(fields=['user_high', 'last_activity_at', 'id'], name='mobile_conversation_high_idx')],
+                'unique_together': {('user_low', 'user_high')},
+            },
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
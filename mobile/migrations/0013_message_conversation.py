@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-18 10:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Greatest, Least
+
+
+def backfill_message_conversations(apps, schema_editor):
+    Message = apps.get_model('mobile', 'Message')
+    Conversation = apps.get_model('mobile', 'Conversation')
+
+    conversation = Conversation.objects.filter(
+        user_low=Least(OuterRef('sender_id'), OuterRef('receiver_id')),
+        user_high=Greatest(OuterRef('sender_id'), OuterRef('receiver_id')),
+    ).values('pk')[:1]
+    Message.objects.update(conversation=Subquery(conversation))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mobile', '0012_conversation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(blank=True, help_text='The conversation between the sender and the receiver.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='mobile.conversation'),
+        ),
+        migrations.RunPython(backfill_message_conversations, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='mobile_message_conv_idx'),
+        ),
+    ]
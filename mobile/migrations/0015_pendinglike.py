@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-18 11:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mobile', '0014_message_unread_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('liked', models.BooleanField(help_text='The state the user asked for last.')),
+                ('version', models.PositiveIntegerField(default=1, help_text='Incremented with every toggle.')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='Number of failed attempts to write the toggle.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When the like was last toggled.')),
+                ('post', models.ForeignKey(help_text='The post whose like was toggled.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mobile.post')),
+                ('user', models.ForeignKey(help_text='The user who toggled the like.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Pending Like',
+                'verbose_name_plural': 'Pending Likes',
+                'unique_together': {('user', 'post')},
+            },
+        ),
+    ]
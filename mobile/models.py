@@ -1,9 +1,12 @@
 import os
 import random
 from base.models import *
+from mobile.managers import *
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 from django.utils.text import slugify
+from mobile.cache import bump_post_version
 from imagekit.processors import ResizeToFill
 from imagekit.models import ProcessedImageField
 
@@ -23,6 +26,16 @@ class Post(models.Model):
     description = models.TextField(help_text="Enter the content or description of the post.")
     created_at = models.DateTimeField(auto_now_add=True, help_text="The date and time when the post was created.")
     updated_at = models.DateTimeField(auto_now=True, help_text="The date and time when the post was last updated.")
+    like_count = models.PositiveIntegerField(default=0, editable=False, help_text="Denormalized number of likes on the post.")
+    comment_count = models.PositiveIntegerField(default=0, editable=False, help_text="Denormalized number of comments on the post.")
+
+    objects = PostManager()
+
+    class Meta:
+        indexes = [
+            # Serves the keyset pagination of the feed, ordered by (-created_at, -id).
+            models.Index(fields=['created_at', 'id'], name='mobile_post_created_id_idx'),
+        ]
 
     def __str__(self):
         """
@@ -60,6 +73,7 @@ class PostImage(models.Model):
         except PostImage.DoesNotExist:
             pass
         super(PostImage, self).save(*args, **kwargs)
+        bump_post_version(self.post_id)
 
     def delete(self, *args, **kwargs):
         """
@@ -69,6 +83,7 @@ class PostImage(models.Model):
             if os.path.isfile(self.image.path):
                 os.remove(self.image.path)
         super(PostImage, self).delete(*args, **kwargs)
+        bump_post_version(self.post_id)
 
 class PostLike(models.Model):
     """
@@ -86,6 +101,10 @@ class PostLike(models.Model):
     class Meta:
         unique_together = ('user', 'post')
         ordering = ['-created_at']
+        indexes = [
+            # Serves the keyset pagination of a post's likers, ordered by (-created_at, -id).
+            models.Index(fields=['post', 'created_at', 'id'], name='mobile_postlike_post_idx'),
+        ]
         verbose_name = "Post Like"
         verbose_name_plural = "Post Likes"
 
@@ -112,6 +131,12 @@ class PostComment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, help_text="The time when the comment was created.")
     updated_at = models.DateTimeField(auto_now=True, help_text="The time when the comment was last updated.")
 
+    class Meta:
+        indexes = [
+            # Serves the keyset pagination of a post's comments, in either direction.
+            models.Index(fields=['post', 'created_at', 'id'], name='mobile_postcomment_post_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user} on {self.post.title}"
 
@@ -141,6 +166,11 @@ class Follow(models.Model):
     class Meta:
         unique_together = ('follower', 'following')
         ordering = ['-created_at']
+        indexes = [
+            # Serve the keyset pagination of a user's followers and followings, newest first.
+            models.Index(fields=['following', 'created_at', 'id'], name='mobile_follow_following_idx'),
+            models.Index(fields=['follower', 'created_at', 'id'], name='mobile_follow_follower_idx'),
+        ]
         verbose_name = 'Follow'
         verbose_name_plural = 'Follows'
 
@@ -171,6 +201,7 @@ class Message(models.Model):
         updated_at (DateTimeField): The timestamp when the message was last updated.
         is_read (BooleanField): Indicates whether the message has been read.
         read_at (DateTimeField): The timestamp when the message was marked as read.
+        conversation (Conversation): The conversation the message belongs to.
     """
     sender = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -189,11 +220,172 @@ class Message(models.Model):
     updated_at = models.DateTimeField(auto_now=True, help_text="Timestamp when the message was last updated.")
     is_read = models.BooleanField(default=False, help_text="Indicates whether the message has been read.")
     read_at = models.DateTimeField(null=True, blank=True, help_text="Timestamp when the message was marked as read.")
+    conversation = models.ForeignKey(
+        'Conversation',
+        null=True,
+        blank=True,
+        related_name='messages',
+        on_delete=models.SET_NULL,
+        help_text="The conversation between the sender and the receiver."
+    )
+
+    objects = MessageManager()
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Serves the id-anchored pagination of a conversation's history in both directions.
+            models.Index(fields=['conversation', 'id'], name='mobile_message_conv_idx'),
+            # Only unread messages: serves marking a conversation as read, and stays small.
+            models.Index(fields=['conversation', 'receiver', 'id'], condition=Q(is_read=False), name='mobile_message_unread_idx'),
+        ]
         verbose_name = "Message"
         verbose_name_plural = "Messages"
 
     def __str__(self):
-        return f"Message from {self.sender} to {self.receiver} at {self.created_at}"
\ No newline at end of file
+        return f"Message from {self.sender} to {self.receiver} at {self.created_at}"
+
+class TimelineEntry(models.Model):
+    """
+    A post materialized into a user's home timeline (fan-out-on-write).
+
+    Attributes:
+        user (User): The owner of the timeline.
+        post (Post): The post delivered to the timeline.
+        author (User): The author of the post, kept to prune entries on unfollow.
+        post_created_at (datetime): Copy of the post's creation time, used for ordering.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries', help_text="The user whose home timeline contains the post.")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries', help_text="The post delivered to the timeline.")
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', help_text="The author of the post.")
+    post_created_at = models.DateTimeField(help_text="The creation time of the post, denormalized for ordering.")
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', 'post_created_at', 'post'], name='mobile_timeline_user_idx'),
+            models.Index(fields=['user', 'author'], name='mobile_timeline_author_idx'),
+        ]
+        verbose_name = "Timeline Entry"
+        verbose_name_plural = "Timeline Entries"
+
+    def __str__(self):
+        return f"'{self.post}' in the timeline of {self.user}"
+
+class FollowSuggestion(models.Model):
+    """
+    A precomputed "people you may know" suggestion (friends of friends).
+
+    Attributes:
+        user (User): The user the suggestion is for.
+        suggested (User): The suggested user, followed by people the user follows.
+        mutual_count (int): How many of the people the user follows follow the suggested user.
+        created_at (datetime): When the suggestion was computed.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='follow_suggestions', help_text="The user the suggestion is for.")
+    suggested = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', help_text="The suggested user.")
+    mutual_count = models.PositiveIntegerField(help_text="Number of followed users who follow the suggested user.")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the suggestion was computed.")
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(fields=['user', '-mutual_count', 'suggested'], name='mobile_suggestion_user_idx'),
+        ]
+        verbose_name = "Follow Suggestion"
+        verbose_name_plural = "Follow Suggestions"
+
+    def __str__(self):
+        return f"{self.suggested} suggested to {self.user}"
+
+class SuggestionRefresh(models.Model):
+    """
+    Marks a user whose follows changed since their suggestions were last computed.
+
+    Attributes:
+        user (User): The user whose suggestions are stale.
+        marked_at (datetime): When the follows last changed.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+', help_text="The user whose suggestions are stale.")
+    marked_at = models.DateTimeField(auto_now=True, help_text="When the user's follows last changed.")
+
+    class Meta:
+        verbose_name = "Suggestion Refresh"
+        verbose_name_plural = "Suggestion Refreshes"
+
+    def __str__(self):
+        return f"Suggestions of {self.user} are stale"
+
+class Conversation(models.Model):
+    """
+    The message thread between two users, summarizing it for the inbox.
+
+    The pair is stored once, lowest user id first, so both participants share the row.
+
+    Attributes:
+        user_low (User): The participant with the lower user id.
+        user_high (User): The participant with the higher user id (the same user for notes to self).
+        last_message (Message): The most recent message of the thread.
+        last_activity_at (datetime): When the most recent message was sent.
+        unread_low (int): Number of messages user_low has not read yet.
+        unread_high (int): Number of messages user_high has not read yet.
+        created_at (datetime): When the first message was sent.
+    """
+    user_low = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', help_text="The participant with the lower user id.")
+    user_high = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', help_text="The participant with the higher user id.")
+    last_message = models.ForeignKey(Message, null=True, blank=True, on_delete=models.SET_NULL, related_name='+', help_text="The most recent message of the conversation.")
+    last_activity_at = models.DateTimeField(help_text="When the most recent message was sent.")
+    unread_low = models.PositiveIntegerField(default=0, help_text="Number of messages the lower-id participant has not read.")
+    unread_high = models.PositiveIntegerField(default=0, help_text="Number of messages the higher-id participant has not read.")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the conversation started.")
+
+    class Meta:
+        unique_together = ('user_low', 'user_high')
+        indexes = [
+            # Serve the keyset pagination of each participant's inbox, most recent first.
+            models.Index(fields=['user_low', 'last_activity_at', 'id'], name='mobile_conversation_low_idx'),
+            models.Index(fields=['user_high', 'last_activity_at', 'id'], name='mobile_conversation_high_idx'),
+        ]
+        verbose_name = "Conversation"
+        verbose_name_plural = "Conversations"
+
+    def __str__(self):
+        return f"Conversation between {self.user_low} and {self.user_high}"
+
+    def other_user(self, user_id):
+        """
+        The participant who is not ``user_id``.
+        """
+        return self.user_high if self.user_low_id == user_id else self.user_low
+
+    def unread_count(self, user_id):
+        return self.unread_low if self.user_low_id == user_id else self.unread_high
+
+class PendingLike(models.Model):
+    """
+    A like toggle acknowledged by the write-behind like buffer (MOBILE_LIKE_BUFFER) and not yet
+    written to PostLike. Every worker reads and flushes the same rows, so the last state a user
+    asked for wins whichever worker received the toggle.
+
+    Attributes:
+        user (User): The user who toggled the like.
+        post (Post): The post whose like was toggled.
+        liked (bool): The state the user asked for last.
+        version (int): Incremented with every toggle, so a flush only removes the state it wrote.
+        attempts (int): Number of failed attempts to write the toggle.
+        updated_at (datetime): When the like was last toggled.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', help_text="The user who toggled the like.")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+', help_text="The post whose like was toggled.")
+    liked = models.BooleanField(help_text="The state the user asked for last.")
+    version = models.PositiveIntegerField(default=1, help_text="Incremented with every toggle.")
+    attempts = models.PositiveSmallIntegerField(default=0, help_text="Number of failed attempts to write the toggle.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="When the like was last toggled.")
+
+    class Meta:
+        unique_together = ('user', 'post')
+        verbose_name = "Pending Like"
+        verbose_name_plural = "Pending Likes"
+
+    def __str__(self):
+        return f"{self.user} {'likes' if self.liked else 'unlikes'} post {self.post_id} (pending)"
@@ -0,0 +1,195 @@
+import json
+import base64
+import binascii
+from django.db.models import Q
+from django.conf import settings
+from django.utils.encoding import force_str
+from django.core.exceptions import ValidationError
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a client supplies a cursor that cannot be decoded or does not
+    match the ordering of the endpoint it was sent to.
+    """
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Build the Q object that selects the rows strictly after ``values`` for the given ordering.
+
+    ``ordering`` is a sequence of field names using Django's '-' prefix for descending order,
+    e.g. ('-created_at', '-id'). With ``reverse=True`` the rows strictly before ``values`` are
+    selected instead, which is what the 'previous page' direction needs.
+
+    For ('-created_at', '-id') and values (t, 5) this yields:
+        created_at < t OR (created_at = t AND id < 5)
+    which the database can answer with a single range scan over a (created_at, id) index.
+    """
+    query = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        if descending != reverse:
+            lookup = f'{name}__lt'
+        else:
+            lookup = f'{name}__gt'
+        query |= equal & Q(**{lookup: value})
+        equal &= Q(**{name: value})
+    return query
+
+def reverse_ordering(ordering):
+    """
+    Flip the direction of every field in an ordering tuple.
+    """
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+class KeysetPagination:
+    """
+    Opaque-cursor (keyset) pagination for the mobile list endpoints.
+
+    Instead of OFFSET, each page is located by the ordering values of the row at its edge,
+    so fetching page 10,000 costs the same as fetching page 1 provided an index exists over
+    the ordering columns. Cursors are base64 encoded JSON and must be treated as opaque by clients.
+
+    Usage inside an APIView:
+        paginator = KeysetPagination(ordering=('-created_at', '-id'))
+        page = paginator.paginate_queryset(queryset, request)
+        ... serialize page ...
+        return Response({..., **paginator.get_page_links()})
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering=('-created_at', '-id'), page_size=None, max_page_size=None):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size or getattr(settings, 'MOBILE_PAGE_SIZE', 20)
+        self.max_page_size = max_page_size or getattr(settings, 'MOBILE_MAX_PAGE_SIZE', 100)
+        self.next_position = None
+        self.previous_position = None
+
+    def get_page_size(self, request):
+        """
+        Returns the requested page size, clamped to ``max_page_size``.
+        Invalid or missing values fall back to the default page size.
+        """
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, position, reverse=False):
+        """
+        Encode the ordering values of an edge row into an opaque cursor string.
+        """
+        payload = {'p': [force_str(value) for value in position]}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor, model=None, annotations=None):
+        """
+        Decode a cursor string into (position, reverse).
+
+        When ``model`` is given, each position value is converted to the type of its ordering
+        field (e.g. the created_at string back to a datetime), so a tampered cursor is rejected
+        here rather than failing in the query. Ordering names found in ``annotations`` (a
+        queryset's query.annotations) use the output field of the annotation.
+        Raises InvalidCursor if the cursor is malformed.
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeError):
+            raise InvalidCursor("Invalid cursor.")
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise InvalidCursor("Invalid cursor.")
+        if model is not None:
+            position = self.convert_position(position, model, annotations or {})
+        return position, reverse
+
+    def convert_position(self, position, model, annotations):
+        """
+        Convert decoded position values with the to_python() of the ordering fields.
+        """
+        converted = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            if name in annotations:
+                field = annotations[name].output_field
+            else:
+                field = model._meta.get_field(name)
+            try:
+                value = field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise InvalidCursor("Invalid cursor.")
+            if value is None:
+                raise InvalidCursor("Invalid cursor.")
+            converted.append(value)
+        return converted
+
+    def get_position(self, item):
+        """
+        Read the ordering values from a model instance or a values() dict.
+        """
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(item, dict):
+            return [item[name] for name in names]
+        return [getattr(item, name) for name in names]
+
+    def paginate_queryset(self, queryset, request):
+        """
+        Return a single page of ``queryset`` as a list, positioned by the request's cursor.
+
+        Only ``page_size + 1`` rows are fetched: the extra row tells whether another page exists
+        in the direction of travel, without a COUNT(*) over the whole table.
+        """
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        position, reverse = (None, False)
+        if cursor:
+            position, reverse = self.decode_cursor(cursor, model=queryset.model, annotations=queryset.query.annotations)
+
+        ordering = reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, position, reverse=reverse))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_position = self.get_position(results[-1]) if results and has_next else None
+        self.previous_position = self.get_position(results[0]) if results and has_previous else None
+        return results
+
+    def get_next_cursor(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_cursor(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_page_links(self):
+        """
+        Returns the cursor keys to merge into a list response.
+        """
+        return {
+            "next": self.get_next_cursor(),
+            "prev": self.get_previous_cursor(),
+        }
@@ -0,0 +1,249 @@
+import re
+import math
+import time
+import bisect
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection
+from mobile.models import Post, Follow
+from django.db.models.functions import Lower
+from django.contrib.auth import get_user_model
+from django.db.models.expressions import RawSQL
+from django.db.models import Q, Max, Count, FloatField
+from mobile.pagination import KeysetPagination, InvalidCursor, keyset_filter
+
+SEARCH_CONFIG = 'english'
+SEARCH_ORDERING = ('-rank', '-id')
+TITLE_WEIGHT = 2.0
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+def _postgres_search(terms, category_id, position, limit):
+    """
+    Rank posts against the trigger-maintained search_vector column (GIN indexed), using
+    websearch syntax ("quoted phrases", -excluded, or).
+    """
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+    vector = RawSQL('"mobile_post"."search_vector"', [], output_field=SearchVectorField())
+    query = SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch')
+    posts = Post.objects.annotate(document=vector, rank=SearchRank(vector, query, output_field=FloatField()))
+    posts = posts.filter(document=query)
+    if category_id is not None:
+        posts = posts.filter(category_id=category_id)
+    if position is not None:
+        posts = posts.filter(keyset_filter(SEARCH_ORDERING, position))
+    return list(posts.order_by(*SEARCH_ORDERING).values_list('rank', 'id')[:limit])
+
+class InvertedIndex:
+    """
+    In-process inverted index over Post.title and Post.description, for backends without a
+    full-text index of their own (SQLite in development, MySQL).
+
+    Each token maps to the posts containing it with a term frequency, title tokens counting
+    TITLE_WEIGHT times. A query matches the posts containing every token and ranks them by
+    tf-idf. The index is rebuilt when the count, highest id or latest update of the posts
+    changes, which one aggregate query checks on every search (queryset.update() calls that
+    skip updated_at are only picked up with the next change).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.signature = None
+        self.postings = {}
+        self.categories = {}
+
+    def refresh(self):
+        signature = tuple(sorted(Post.objects.aggregate(count=Count('id'), max_id=Max('id'), updated=Max('updated_at')).items()))
+        if signature == self.signature:
+            return
+        with self.lock:
+            if signature == self.signature:
+                return
+            postings = defaultdict(dict)
+            categories = {}
+            for post_id, category_id, title, description in Post.objects.values_list('id', 'category_id', 'title', 'description').iterator():
+                categories[post_id] = category_id
+                weights = defaultdict(float)
+                for token in tokenize(title):
+                    weights[token] += TITLE_WEIGHT
+                for token in tokenize(description):
+                    weights[token] += 1.0
+                for token, weight in weights.items():
+                    postings[token][post_id] = weight
+            self.postings, self.categories, self.signature = dict(postings), categories, signature
+
+    def search(self, terms, category_id, position, limit):
+        self.refresh()
+        postings, categories = self.postings, self.categories
+        tokens = set(tokenize(terms))
+        if not tokens or any(token not in postings for token in tokens):
+            return []
+
+        total = len(categories)
+        ranks = None
+        for token in sorted(tokens, key=lambda token: len(postings[token])):
+            matches = postings[token]
+            idf = math.log(1 + total / len(matches))
+            if ranks is None:
+                ranks = {post_id: 0.0 for post_id in matches}
+            else:
+                ranks = {post_id: rank for post_id, rank in ranks.items() if post_id in matches}
+            for post_id in ranks:
+                ranks[post_id] += (1 + math.log(matches[post_id])) * idf
+
+        results = [(round(rank, 6), post_id) for post_id, rank in ranks.items()]
+        if category_id is not None:
+            results = [(rank, post_id) for rank, post_id in results if categories.get(post_id) == category_id]
+        if position is not None:
+            after = (float(position[0]), int(position[1]))
+            results = [result for result in results if result < after]
+        results.sort(reverse=True)
+        return results[:limit]
+
+index = InvertedIndex()
+
+def search_posts(request, terms, category_id=None):
+    """
+    Return (post ids, paginator) for one page of posts matching ``terms``, best match first.
+
+    Pages are keyset paginated over (rank, id); only forward ('next') cursors are issued.
+    PostgreSQL uses the search_vector column, other backends the in-process index.
+    """
+    paginator = KeysetPagination(ordering=SEARCH_ORDERING)
+    page_size = paginator.get_page_size(request)
+    position = None
+    cursor = request.query_params.get(paginator.cursor_query_param)
+    if cursor:
+        position, reverse = paginator.decode_cursor(cursor)
+        if reverse:
+            raise InvalidCursor("Invalid cursor.")
+        try:
+            position = [float(position[0]), int(position[1])]
+        except (TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor.")
+
+    if connection.vendor == 'postgresql':
+        results = _postgres_search(terms, category_id, position, page_size + 1)
+    else:
+        results = index.search(terms, category_id, position, page_size + 1)
+
+    has_more = len(results) > page_size
+    results = results[:page_size]
+    paginator.next_position = list(results[-1]) if results and has_more else None
+    return [post_id for _, post_id in results], paginator
+
+USER_SEARCH_FIELDS = ('name', 'username', 'phone_number')
+
+def get_user_search_limit(request):
+    """
+    The ?limit= of a user search, between 1 and 50 (MOBILE_USER_SEARCH_LIMIT by default).
+    """
+    default = getattr(settings, 'MOBILE_USER_SEARCH_LIMIT', 10)
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except (TypeError, ValueError):
+        return default
+    return min(max(limit, 1), 50)
+
+def _user_prefix_query(users, field, prefix):
+    """
+    Filter and order ``users`` by a prefix of one column, in the form the prefix indexes of
+    account migration 0003 serve: LOWER(column) LIKE 'prefix%' on PostgreSQL (text_pattern_ops),
+    a LIKE on the case-insensitive column on MySQL.
+    """
+    if connection.vendor == 'postgresql' and field != 'phone_number':
+        return users.annotate(prefix_key=Lower(field)).filter(prefix_key__startswith=prefix).order_by('prefix_key', 'id')
+    if connection.vendor == 'postgresql':
+        return users.filter(**{f'{field}__startswith': prefix}).order_by(field, 'id')
+    return users.filter(**{f'{field}__istartswith': prefix}).order_by(field, 'id')
+
+class PrefixIndex:
+    """
+    In-process sorted prefix index over the lowercased name, username and phone number of
+    active users, for backends without the prefix indexes (SQLite in development).
+
+    A prefix lookup is a binary search into one sorted list of (key, user id) pairs followed by
+    a scan of the matching range. The index is rebuilt when the number of users or the highest
+    id changes, and at least every MOBILE_USER_SEARCH_INDEX_TTL seconds to pick up edits.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.signature = None
+        self.built_at = 0
+        self.keys = []
+
+    def refresh(self):
+        User = get_user_model()
+        signature = tuple(sorted(User.objects.filter(is_active=True).aggregate(count=Count('id'), max_id=Max('id')).items()))
+        ttl = getattr(settings, 'MOBILE_USER_SEARCH_INDEX_TTL', 60)
+        if signature == self.signature and time.monotonic() - self.built_at < ttl:
+            return
+        with self.lock:
+            if signature == self.signature and time.monotonic() - self.built_at < ttl:
+                return
+            keys = []
+            for user_id, *values in User.objects.filter(is_active=True).values_list('id', *USER_SEARCH_FIELDS).iterator():
+                keys.extend((value.lower(), user_id) for value in values if value)
+            keys.sort()
+            self.keys = keys
+            self.signature, self.built_at = signature, time.monotonic()
+
+    def search(self, prefix, limit, exclude=()):
+        """
+        Return up to ``limit`` user ids with a key starting with ``prefix``, ordered by key.
+        """
+        self.refresh()
+        keys = self.keys
+        found = []
+        seen = set(exclude)
+        for position in range(bisect.bisect_left(keys, (prefix,)), len(keys)):
+            key, user_id = keys[position]
+            if not key.startswith(prefix) or len(found) >= limit:
+                break
+            if user_id not in seen:
+                seen.add(user_id)
+                found.append(user_id)
+        return found
+
+user_index = PrefixIndex()
+
+def search_users(viewer, terms, limit):
+    """
+    Return (users, followed ids): up to ``limit`` active users whose name, username or phone
+    number starts with ``terms`` (case-insensitively), the ones the viewer follows first, and
+    the ids among them the viewer follows.
+
+    The followed users are found through the viewer's own Follow rows. The others cost one
+    index range scan with LIMIT per column on PostgreSQL and MySQL, so a lookup does not get
+    slower with the number of users. Other backends use the in-process prefix index.
+    """
+    User = get_user_model()
+    prefix = terms.strip().lower()
+    if not prefix:
+        return [], set()
+    active = User.objects.filter(is_active=True)
+    matching = Q()
+    for field in USER_SEARCH_FIELDS:
+        matching |= Q(**{f'{field}__istartswith': prefix})
+
+    ids = []
+    if viewer.is_authenticated:
+        followed = active.filter(matching, followers_set__follower_id=viewer.pk).order_by('name', 'id')
+        ids = list(followed.values_list('id', flat=True)[:limit])
+    followed_ids = set(ids)
+
+    if connection.vendor in ('postgresql', 'mysql'):
+        others = []
+        for field in USER_SEARCH_FIELDS:
+            others.extend(_user_prefix_query(active.exclude(pk__in=ids), field, prefix).values_list('id', flat=True)[:limit])
+    else:
+        others = user_index.search(prefix, limit, exclude=ids)
+    for user_id in others:
+        if user_id not in followed_ids and len(ids) < limit and user_id not in ids:
+            ids.append(user_id)
+
+    users_by_id = active.in_bulk(ids)
+    return [users_by_id[user_id] for user_id in ids if user_id in users_by_id], followed_ids
@@ -1,12 +1,60 @@
 from base.models import *
 from mobile.models import *
 from account.models import *
+from django.conf import settings
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+def parse_sparse_params(request):
+    """
+    Read the ?fields= and ?expand= query parameters of a request.
+
+    Returns a (fields, expand) tuple where each item is a set of names, or None when
+    the parameter was not supplied. An empty parameter (e.g. ?expand=) yields an empty set.
+    """
+    def parse(name):
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        return {item.strip() for item in value.split(',') if item.strip()}
+    return parse('fields'), parse('expand')
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin implementing sparse fieldsets and expansion control.
+
+    Accepts two optional keyword arguments, usually taken from parse_sparse_params():
+      - fields: the readable top-level fields to return. Anything else is skipped.
+      - expand: the relations listed in Meta.expandable_fields to embed in full. A forward
+        relation that is requested but not expanded is rendered as its primary key, and a
+        many-valued relation that is not expanded is skipped.
+    When neither argument is given the serializer renders exactly as it always has.
+    Write-only fields are never removed, so the same serializer keeps accepting input.
+    """
+    def __init__(self, *args, **kwargs):
+        self.requested_fields = kwargs.pop('fields', None)
+        self.requested_expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.requested_expand is not None:
+            for name in getattr(self.Meta, 'expandable_fields', ()):
+                if name not in fields or name in self.requested_expand:
+                    continue
+                if isinstance(fields[name], serializers.ListSerializer):
+                    del fields[name]
+                else:
+                    fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        if self.requested_fields is not None:
+            for name in list(fields):
+                if name not in self.requested_fields and not fields[name].write_only:
+                    del fields[name]
+        return fields
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer to represent detailed user information.
     Exposes the user's name, email, phone number, username, and image.
@@ -90,9 +138,12 @@ class CategoryNestedSerializer(serializers.ModelSerializer):
         model = Category
         fields = ('id', 'name', 'slug')
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Post model including nested user, category, images, likes, and comments.
+    Loaded through Post.objects.for_feed(), 'likes' and 'comments' are previews of the most recent
+    likes and comments (MOBILE_LIKES_PREVIEW_SIZE / MOBILE_COMMENTS_PREVIEW_SIZE). 'like_count' and
+    'comment_count' have the totals, and PostLikes / PostComments list them all.
     
     Accepts 'category_id' as a write-only field for input and outputs detailed category data via a nested CategoryNestedSerializer.
     Also accepts 'upload_images' as a write-only field to handle image file uploads.
@@ -120,8 +171,10 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = ('id', 'user', 'title', 'category_id', 'category', 'description',
-                  'created_at', 'updated_at', 'images', 'likes', 'comments', 'upload_images')
-        read_only_fields = ('id', 'created_at', 'updated_at')
+                  'created_at', 'updated_at', 'images', 'likes', 'comments',
+                  'like_count', 'comment_count', 'upload_images')
+        read_only_fields = ('id', 'created_at', 'updated_at', 'like_count', 'comment_count')
+        expandable_fields = ('user', 'category', 'images', 'likes', 'comments')
 
     def create(self, validated_data):
         """
@@ -154,6 +207,24 @@ class PostSerializer(serializers.ModelSerializer):
                 PostImage.objects.create(post=instance, image=image)
         return instance
 
+class CompactPostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """
+    Read-only feed representation of a Post.
+
+    Carries the denormalized 'like_count' and 'comment_count' instead of the full likes and
+    comments arrays, so neither the arrays nor their nested users need to be loaded.
+    """
+    user = UserSerializer(read_only=True)
+    category = CategoryNestedSerializer(read_only=True)
+    images = PostImageSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ('id', 'user', 'title', 'category', 'description', 'created_at', 'updated_at',
+                  'images', 'like_count', 'comment_count')
+        read_only_fields = fields
+        expandable_fields = ('user', 'category', 'images')
+
 class FollowSerializer(serializers.ModelSerializer):
     follower = UserSerializer(read_only=True)
     following = UserSerializer(read_only=True)
@@ -162,6 +233,14 @@ class FollowSerializer(serializers.ModelSerializer):
         model = Follow
         fields = ('id', 'follower', 'following', 'created_at')
 
+class BulkFollowSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['follow', 'unfollow'])
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'MOBILE_BULK_FOLLOW_MAX_IDS', 100),
+    )
+
 class MessageCreateSerializer(serializers.ModelSerializer):
     receiver = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
@@ -174,10 +253,11 @@ class MessageCreateSerializer(serializers.ModelSerializer):
         validated_data['sender'] = request.user
         return super().create(validated_data)
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     receiver = UserSerializer(read_only=True)
 
     class Meta:
         model = Message
         fields = ['id', 'sender', 'receiver', 'body', 'created_at', 'updated_at', 'is_read', 'read_at']
+        expandable_fields = ('sender', 'receiver')
@@ -0,0 +1,145 @@
+import heapq
+import bisect
+from array import array
+from django.conf import settings
+from django.utils import timezone
+from django.db import connection, transaction
+from django.contrib.auth import get_user_model
+from mobile.models import Follow, FollowSuggestion, SuggestionRefresh
+
+def get_suggestions_size():
+    return getattr(settings, 'MOBILE_SUGGESTIONS_SIZE', 20)
+
+def get_suggestions_batch_size():
+    return getattr(settings, 'MOBILE_SUGGESTIONS_BATCH_SIZE', 1000)
+
+def mark_stale(user_ids):
+    """
+    Queue users whose follows changed for the next incremental refresh_suggestions().
+
+    MySQL's upsert (ON DUPLICATE KEY UPDATE) takes no conflict target, so unique_fields is
+    only passed to the backends that support one.
+    """
+    unique_fields = ['user'] if connection.features.supports_update_conflicts_with_target else None
+    SuggestionRefresh.objects.bulk_create(
+        [SuggestionRefresh(user_id=user_id) for user_id in user_ids],
+        update_conflicts=True, unique_fields=unique_fields, update_fields=['marked_at'],
+    )
+
+class FollowGraph:
+    """
+    The follow graph in compressed sparse row form, held in ``array`` buffers.
+
+    Users are numbered by their position in the sorted ``ids`` array, and the users followed
+    by node ``n`` are ``indices[indptr[n]:indptr[n + 1]]``. Millions of edges take a few bytes
+    each, against hundreds for a dict of sets.
+    """
+    def __init__(self, ids, active, indptr, indices):
+        self.ids = ids
+        self.active = active
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = array('l', bytes(array('l').itemsize * len(ids)))
+
+    @classmethod
+    def load(cls):
+        """
+        Read the whole graph with two streamed queries: the users, then Follow in follower order.
+
+        The two queries do not share a snapshot, so an edge may name a user created after the
+        first one ran; such edges are skipped, the next load picks them up.
+        """
+        User = get_user_model()
+        ids = array('q')
+        active = bytearray()
+        for user_id, is_active in User.objects.order_by('id').values_list('id', 'is_active').iterator(chunk_size=10000):
+            ids.append(user_id)
+            active.append(is_active)
+
+        indptr = array('q', bytes(array('q').itemsize * (len(ids) + 1)))
+        indices = array('l')
+        edges = Follow.objects.order_by('follower_id', 'following_id').values_list('follower_id', 'following_id')
+        for follower_id, following_id in edges.iterator(chunk_size=10000):
+            follower = bisect.bisect_left(ids, follower_id)
+            following = bisect.bisect_left(ids, following_id)
+            if follower == len(ids) or ids[follower] != follower_id or following == len(ids) or ids[following] != following_id:
+                continue
+            indptr[follower + 1] += 1
+            indices.append(following)
+        for node in range(len(ids)):
+            indptr[node + 1] += indptr[node]
+        return cls(ids, active, indptr, indices)
+
+    def node(self, user_id):
+        position = bisect.bisect_left(self.ids, user_id)
+        if position < len(self.ids) and self.ids[position] == user_id:
+            return position
+        return None
+
+    def suggest(self, node, size):
+        """
+        Return up to ``size`` (user id, mutual count) pairs for ``node``: the active users
+        followed by the most of the users ``node`` follows, excluding ``node`` itself and the
+        users it already follows. Ties go to the lowest user id.
+
+        Scores are accumulated in the graph's shared ``scores`` array, and only the entries
+        that were touched are read back and reset, so one call costs the number of two-hop
+        paths from ``node`` whatever the size of the graph.
+        """
+        ids, active, indptr, indices, scores = self.ids, self.active, self.indptr, self.indices, self.scores
+        following = indices[indptr[node]:indptr[node + 1]]
+        excluded = set(following)
+        excluded.add(node)
+        touched = []
+        for followed in following:
+            for candidate in indices[indptr[followed]:indptr[followed + 1]]:
+                if candidate in excluded or not active[candidate]:
+                    continue
+                if not scores[candidate]:
+                    touched.append(candidate)
+                scores[candidate] += 1
+        best = heapq.nsmallest(size, touched, key=lambda candidate: (-scores[candidate], ids[candidate]))
+        suggestions = [(ids[candidate], scores[candidate]) for candidate in best]
+        for candidate in touched:
+            scores[candidate] = 0
+        return suggestions
+
+def _write(graph, user_ids, size):
+    rows = []
+    for user_id in user_ids:
+        node = graph.node(user_id)
+        if node is None or not graph.active[node]:
+            continue
+        rows.extend(
+            FollowSuggestion(user_id=user_id, suggested_id=suggested_id, mutual_count=mutual_count)
+            for suggested_id, mutual_count in graph.suggest(node, size)
+        )
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=user_ids).delete()
+        FollowSuggestion.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+def refresh_suggestions(full=False, size=None):
+    """
+    Recompute the stored FollowSuggestion rows and return (users refreshed, rows written).
+
+    A full refresh recomputes every user. Otherwise only the users queued by mark_stale() are,
+    and their markers are removed unless their follows changed again during the run. Either
+    way the graph is loaded once and users are written in transactions of
+    MOBILE_SUGGESTIONS_BATCH_SIZE, replacing their previous suggestions.
+    """
+    size = size or get_suggestions_size()
+    batch_size = get_suggestions_batch_size()
+    started_at = timezone.now()
+    graph = FollowGraph.load()
+    if full:
+        user_ids = list(graph.ids)
+    else:
+        user_ids = list(SuggestionRefresh.objects.order_by('user_id').values_list('user_id', flat=True))
+
+    written = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        written += _write(graph, batch, size)
+        SuggestionRefresh.objects.filter(user_id__in=batch, marked_at__lte=started_at).delete()
+    return len(user_ids), written
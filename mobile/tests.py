@@ -1,3 +1,448 @@
-from django.test import TestCase
+import json
+import base64
+import asyncio
+import threading
+from base.models import Category
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework.request import Request
+from django.contrib.auth import get_user_model
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+from django.core.cache import cache
+from django.db import connection, OperationalError
+from mobile.toggles import toggle_like, toggle_follow, retry_on_deadlock
+from rest_framework_simplejwt.tokens import AccessToken
+from mobile.conversations import send_message, get_inbox
+from mobile.events import EVENTS_PATH, EventStreamApp, LocalBroker
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from mobile.models import Post, PostImage, PostLike, PostComment, Follow, Message
+from mobile.serializers import UserSerializer, PostSerializer, MessageSerializer, CompactPostSerializer, MessageCreateSerializer
+from mobile.fast_serializers import FastPostSerializer, FastCompactPostSerializer, post_rows, serialize_posts, serialize_users, serialize_conversations
 
-# Create your tests here.
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentToggleTests(TransactionTestCase):
+    """
+    toggle_like() and toggle_follow() hammered from many threads at once.
+
+    Every user toggles from several threads at the same time (concurrent double taps). No toggle
+    may raise, deadlock victims included, and the stored counters must match the rows that
+    actually exist. Runs on the backends with row locks (PostgreSQL, MySQL); SQLite serializes
+    writers at the file level. Run it against MySQL too, where REPEATABLE READ gap locks make
+    the concurrent INSERTs deadlock.
+    """
+    users = 20
+    threads_per_user = 4
+    toggles = 10
+
+    def setUp(self):
+        User = get_user_model()
+        User.objects.bulk_create([
+            User(email=f"hammer-{i}@example.com", username=f"hammer-{i}", phone_number=f"0780000{i:03d}")
+            for i in range(self.users + 1)
+        ])
+        users = list(User.objects.filter(username__startswith="hammer-").order_by('pk'))
+        self.target, self.togglers = users[0], users[1:]
+        category = Category.objects.create(name="Hammer")
+        self.post = Post.objects.create(user=self.target, category=category, title="Hammer post", description="Hammer post")
+
+    def hammer(self, toggle):
+        errors = []
+        barrier = threading.Barrier(len(self.togglers) * self.threads_per_user)
+
+        def worker(user):
+            try:
+                barrier.wait()
+                for _ in range(self.toggles):
+                    toggle(user)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(user,))
+            for user in self.togglers for _ in range(self.threads_per_user)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_toggle_like(self):
+        self.hammer(lambda user: toggle_like(user, self.post.pk))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, PostLike.objects.filter(post=self.post).count())
+
+    def test_toggle_follow(self):
+        self.hammer(lambda user: toggle_follow(user, self.target.pk))
+        self.target.refresh_from_db()
+        self.assertEqual(self.target.follower_count, Follow.objects.filter(following=self.target).count())
+        for user in get_user_model().objects.filter(pk__in=[user.pk for user in self.togglers]):
+            self.assertEqual(user.following_count, Follow.objects.filter(follower=user).count())
+
+class DeadlockRetryTests(SimpleTestCase):
+    """
+    retry_on_deadlock() replays a write aborted as a deadlock victim, and only that.
+    """
+    def failing(self, error, failures):
+        calls = []
+
+        @retry_on_deadlock
+        def write():
+            calls.append(None)
+            if len(calls) <= failures:
+                raise error
+            return len(calls)
+        return write, calls
+
+    def test_retries_deadlocks(self):
+        write, calls = self.failing(OperationalError(1213, "Deadlock found when trying to get lock"), 2)
+        self.assertEqual(write(), 3)
+
+    def test_gives_up(self):
+        write, calls = self.failing(OperationalError(1213, "Deadlock found when trying to get lock"), 10)
+        with self.settings(MOBILE_DEADLOCK_RETRIES=2), self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors(self):
+        write, calls = self.failing(OperationalError(2006, "MySQL server has gone away"), 1)
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+class EventStreamTests(TransactionTestCase):
+    """
+    Many concurrent idle streams served by EventStreamApp in one process, driven the way an ASGI
+    server drives it.
+
+    Every stream must be accepted, receive the one event published to its user, and release its
+    subscription once the client disconnects. A TransactionTestCase because the token's user is
+    loaded from a worker thread.
+    """
+    users = 50
+    streams = 500
+
+    def setUp(self):
+        User = get_user_model()
+        User.objects.bulk_create([
+            User(email=f"events-{i}@example.com", username=f"events-{i}", phone_number=f"0790000{i:03d}")
+            for i in range(self.users)
+        ])
+        users = User.objects.filter(username__startswith="events-").order_by('pk')
+        self.tokens = {user.pk: str(AccessToken.for_user(user)).encode() for user in users}
+        self.user_ids = list(self.tokens)
+
+    async def run_streams(self, broker):
+        app = EventStreamApp(broker=broker)
+        streams = []
+
+        def open_stream(user_id):
+            stream = {'closed': asyncio.Event(), 'connected': asyncio.Event(), 'received': asyncio.Event(), 'status': None}
+
+            async def receive():
+                await stream['closed'].wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    stream['status'] = message['status']
+                elif message.get('body', b'').startswith(b'id: '):
+                    stream['received'].set()
+                else:
+                    stream['connected'].set()
+
+            scope = {'type': 'http', 'method': 'GET', 'path': EVENTS_PATH, 'headers': [(b'authorization', b'Bearer ' + self.tokens[user_id])]}
+            stream['task'] = asyncio.ensure_future(app(scope, receive, send))
+            streams.append(stream)
+
+        for i in range(self.streams):
+            open_stream(self.user_ids[i % self.users])
+        await asyncio.wait_for(asyncio.gather(*(stream['connected'].wait() for stream in streams)), timeout=60)
+        subscribed = broker.count()
+        for user_id in self.user_ids:
+            broker.publish(user_id, {'id': 1, 'event': 'message', 'data': {'body': "Hello"}})
+        await asyncio.wait_for(asyncio.gather(*(stream['received'].wait() for stream in streams)), timeout=60)
+        for stream in streams:
+            stream['closed'].set()
+        await asyncio.gather(*(stream['task'] for stream in streams))
+        return streams, subscribed
+
+    def test_fan_out(self):
+        broker = LocalBroker()
+        streams, subscribed = asyncio.run(self.run_streams(broker))
+        self.assertEqual({stream['status'] for stream in streams}, {200})
+        self.assertEqual(subscribed, self.streams)
+        self.assertEqual(broker.count(), 0)
+
+class FastSerializerParityTests(TestCase):
+    """
+    The fast read-only serializers must render byte for byte what the DRF serializers render.
+
+    File names contain spaces, unicode and characters that need quoting, one author has no image,
+    one post has no author and one message was read.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = User.objects.bulk_create([
+            User(
+                name=f"Parity Ñame {i}", email=f"parity-{i}@example.com", phone_number=f"+2509{i:08d}",
+                username=f"parity-user-{i}", image='' if i == 0 else f"users/parity user ñ {i} (1).jpeg",
+            )
+            for i in range(5)
+        ])
+        category = Category.objects.create(name="Parity category")
+        posts = Post.objects.bulk_create([
+            Post(user=None if i == 0 else cls.users[i % 5], category=category, title=f"Parity post {i} — ✓", description="Lorem ipsum dolor sit amet.")
+            for i in range(6)
+        ])
+        PostImage.objects.bulk_create([PostImage(post=post, image=f"posts/parity post {post.pk}#{k}?.jpg") for post in posts for k in range(2)])
+        PostLike.objects.bulk_create([PostLike(post=post, user=user) for post in posts for user in cls.users])
+        PostComment.objects.bulk_create([PostComment(post=post, user=user, comment=f"Nice post, {user.username}!") for post in posts for user in cls.users])
+
+    def setUp(self):
+        self.request = Request(APIRequestFactory().get('/api/posts/', HTTP_HOST='api.example.com'))
+        self.request.user = self.users[0]
+        self.context = {'request': self.request}
+
+    def assertSameJSON(self, fast, drf):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(fast), renderer.render(drf))
+
+    def test_posts(self):
+        for compact, drf_class, fast_class in ((False, PostSerializer, FastPostSerializer), (True, CompactPostSerializer, FastCompactPostSerializer)):
+            with self.subTest(compact=compact):
+                queryset = Post.objects.order_by('-created_at', '-id')
+                posts = list(queryset.for_feed(compact=compact))
+                expected = drf_class(posts, many=True, context=self.context).data
+                self.assertSameJSON(serialize_posts(posts, self.request, many=True, compact=compact), expected)
+                self.assertSameJSON(fast_class(post_rows(queryset, compact=compact), many=True, context=self.context).data, expected)
+                self.assertSameJSON(serialize_posts(posts[-1], self.request, compact=compact), drf_class(posts[-1], context=self.context).data)
+
+    def test_users(self):
+        users = list(get_user_model().objects.filter(pk__in=[user.pk for user in self.users]).order_by('pk'))
+        self.assertSameJSON(serialize_users(users, self.request, many=True), UserSerializer(users, many=True, context=self.context).data)
+        self.assertSameJSON(serialize_users(users[0], self.request), UserSerializer(users[0], context=self.context).data)
+
+    def test_conversations(self):
+        for receiver in self.users[1:]:
+            serializer = MessageCreateSerializer(data={'receiver': receiver.pk, 'body': f"Hello {receiver.name} ✓"}, context=self.context)
+            serializer.is_valid(raise_exception=True)
+            send_message(serializer)
+        Message.objects.filter(receiver=self.users[1]).update(is_read=True, read_at=timezone.now())
+        conversations, _ = get_inbox(self.users[0], self.request)
+        self.assertEqual(len(conversations), 4)
+        rendered = serialize_conversations(conversations, self.request)
+        for conversation, data in zip(conversations, rendered):
+            other = conversation.other_user(self.users[0].pk)
+            self.assertSameJSON(data['user'], UserSerializer(other, context=self.context).data)
+            self.assertSameJSON(data['last_message'], MessageSerializer(conversation.last_message, context=self.context).data)
+
+class FeedCursorTests(APITestCase):
+    """
+    Keyset cursors of the posts feed: walking 'next' and back with 'prev' visits every post
+    exactly once in (-created_at, -id) order, ties included, and a cursor that cannot be decoded
+    or does not match the ordering is a 400.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create(email="cursor@example.com", username="cursor", phone_number="0781000000")
+        category = Category.objects.create(name="Cursor")
+        posts = Post.objects.bulk_create([
+            Post(user=user, category=category, title=f"Cursor post {i}", description="Cursor post") for i in range(7)
+        ])
+        start = timezone.now() - timedelta(days=1)
+        # Posts 2 and 3 share a timestamp, so the id decides their order.
+        for post, minutes in zip(posts, (0, 1, 2, 2, 3, 4, 5)):
+            Post.objects.filter(pk=post.pk).update(created_at=start + timedelta(minutes=minutes))
+        cls.expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def get_page(self, cursor=None):
+        params = {'page_size': 3, 'compact': 'true'}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get('/api/posts/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_round_trip(self):
+        pages = [self.get_page()]
+        while pages[-1]['next']:
+            pages.append(self.get_page(pages[-1]['next']))
+        self.assertEqual([post['id'] for page in pages for post in page['data']], self.expected)
+        self.assertIsNone(pages[0]['prev'])
+        self.assertEqual([len(page['data']) for page in pages], [3, 3, 1])
+        for previous, page in zip(pages, pages[1:]):
+            self.assertEqual(self.get_page(page['prev'])['data'], previous['data'])
+
+    def test_invalid_cursor(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+        for cursor in ("not-a-cursor", encode({'p': ["not a date", "1"]}), encode({'p': [None, 1]}), encode({'p': ["1"]}), encode([1, 2])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/posts/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"detail": "Invalid cursor."})
+
+class ResponseCacheTests(APITestCase):
+    """
+    The cached feed pages and post details are served until a post they embed changes through
+    the API, then rebuilt. Writes that bypass the API (a queryset update) are not seen, which
+    shows the response came from the cache. Versions are bumped on commit, so the writes run
+    under captureOnCommitCallbacks().
+    """
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author = User.objects.create(email="cache-author@example.com", username="cache-author", phone_number="0782000000")
+        cls.reader = User.objects.create(email="cache-reader@example.com", username="cache-reader", phone_number="0782000001")
+        category = Category.objects.create(name="Cache")
+        cls.post = Post.objects.create(user=cls.author, category=category, title="Cached", description="Cached post")
+        cls.other = Post.objects.create(user=cls.author, category=category, title="Other", description="Other post")
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self):
+        return {post['id']: post for post in self.client.get('/api/posts/', {'compact': 'true'}).json()['data']}
+
+    def detail(self):
+        return self.client.get(f'/api/post/{self.post.pk}/').json()['data']
+
+    def test_like_invalidates(self):
+        self.assertEqual(self.feed()[self.post.pk]['like_count'], 0)
+        self.client.force_authenticate(self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f'/api/post/{self.post.pk}/like/').status_code, 201)
+        self.assertEqual(self.feed()[self.post.pk]['like_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f'/api/post/{self.post.pk}/like/').status_code, 200)
+        self.assertEqual(self.feed()[self.post.pk]['like_count'], 0)
+
+    def test_edit_invalidates(self):
+        self.assertEqual(self.feed()[self.post.pk]['title'], "Cached")
+        self.assertEqual(self.detail()['title'], "Cached")
+        Post.objects.filter(pk__in=[self.post.pk, self.other.pk]).update(title="Stale")
+        self.assertEqual(self.feed()[self.post.pk]['title'], "Cached")
+        self.assertEqual(self.detail()['title'], "Cached")
+
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/post/{self.post.pk}/update/', {'title': "Edited"})
+        self.assertEqual(response.status_code, 200)
+        feed = self.feed()
+        self.assertEqual(feed[self.post.pk]['title'], "Edited")
+        self.assertEqual(feed[self.other.pk]['title'], "Stale")
+        self.assertEqual(self.detail()['title'], "Edited")
+
+class ConditionalGetTests(APITestCase):
+    """
+    ETags of the read endpoints: a matching If-None-Match is answered with 304 and no body,
+    and the ETag moves when the resource or the viewer-relative state it shows changes.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author = User.objects.create(email="etag-author@example.com", username="etag-author", phone_number="0783000000")
+        cls.reader = User.objects.create(email="etag-reader@example.com", username="etag-reader", phone_number="0783000001")
+        category = Category.objects.create(name="ETag")
+        cls.post = Post.objects.create(user=cls.author, category=category, title="ETag", description="ETag post")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.reader)
+
+    def assertNotModified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        return etag
+
+    def test_post_detail(self):
+        url = f'/api/post/{self.post.pk}/'
+        etag = self.assertNotModified(url)
+        self.client.post(f'/api/post/{self.post.pk}/like/')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        liked = self.assertNotModified(url)
+        self.client.force_authenticate(self.author)
+        self.assertNotEqual(self.assertNotModified(url), liked)
+
+    def test_categories(self):
+        etag = self.assertNotModified('/api/categories/')
+        Post.objects.filter(pk=self.post.pk).update(title="Retitled", updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_message_history(self):
+        url = f'/api/message/history/{self.author.pk}/'
+        etag = self.assertNotModified(url)
+        self.client.post('/api/message/send/', {'receiver': self.author.pk, 'body': "Hello"})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertNotModified(url)
+
+class InboxTests(APITestCase):
+    """
+    The inbox lists conversations by latest activity with per-conversation unread counts, and
+    marking a conversation read (up to a message or entirely) keeps those counts in step.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.me, cls.a, cls.b, cls.c, cls.stranger = User.objects.bulk_create([
+            User(email=f"inbox-{i}@example.com", username=f"inbox-{i}", phone_number=f"0784000{i:03d}")
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        self.first = self.send(self.a, self.me, "First from A")
+        self.send(self.b, self.me, "From B")
+        self.send(self.me, self.c, "To C")
+        self.last = self.send(self.a, self.me, "Second from A")
+        self.client.force_authenticate(self.me)
+
+    def send(self, sender, receiver, body):
+        self.client.force_authenticate(sender)
+        response = self.client.post('/api/message/send/', {'receiver': receiver.pk, 'body': body})
+        self.assertEqual(response.status_code, 201)
+        return response.json()['message']['id']
+
+    def inbox(self, **params):
+        response = self.client.get(f'/api/user/{self.me.pk}/inbox/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ordering_and_unread_counts(self):
+        conversations = self.inbox()['conversations']
+        self.assertEqual([conversation['user']['id'] for conversation in conversations], [self.a.pk, self.c.pk, self.b.pk])
+        self.assertEqual([conversation['unread_count'] for conversation in conversations], [2, 0, 1])
+        self.assertEqual(conversations[0]['last_message']['id'], self.last)
+
+        first_page = self.inbox(page_size=2)
+        second_page = self.inbox(page_size=2, cursor=first_page['next'])
+        self.assertEqual([conversation['id'] for conversation in first_page['conversations'] + second_page['conversations']], [conversation['id'] for conversation in conversations])
+        self.assertIsNone(second_page['next'])
+
+    def test_mark_read(self):
+        url = f'/api/conversation/{self.a.pk}/read/'
+        response = self.client.post(url, {'message_id': self.first})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"detail": "Messages marked as read.", "marked": 1, "unread_count": 1, "unread_total": 2})
+
+        response = self.client.post(url)
+        self.assertEqual(response.json(), {"detail": "Messages marked as read.", "marked": 1, "unread_count": 0, "unread_total": 1})
+        self.assertEqual(self.client.post(url).json()['marked'], 0)
+        self.assertEqual([conversation['unread_count'] for conversation in self.inbox()['conversations']], [0, 0, 1])
+        self.assertEqual(Message.objects.filter(receiver=self.me, sender=self.a, is_read=False).count(), 0)
+
+    def test_mark_read_errors(self):
+        self.assertEqual(self.client.post(f'/api/conversation/{self.stranger.pk}/read/').status_code, 404)
+        self.assertEqual(self.client.post(f'/api/conversation/{self.a.pk}/read/', {'message_id': "latest"}).status_code, 400)
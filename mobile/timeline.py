@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.contrib.auth import get_user_model
+from django.db.models.functions import RowNumber
+from mobile.models import Post, Follow, TimelineEntry
+from mobile.pagination import KeysetPagination, InvalidCursor, keyset_filter
+
+def get_fanout_limit():
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', 10000)
+
+def is_large_account(user):
+    """
+    Accounts with at least TIMELINE_FANOUT_LIMIT followers are not fanned out on write;
+    their posts are merged into followers' timelines at read time instead.
+    """
+    return user.follower_count >= get_fanout_limit()
+
+def _entries_for(post, user_ids):
+    return [
+        TimelineEntry(user_id=user_id, post_id=post.pk, author_id=post.user_id, post_created_at=post.created_at)
+        for user_id in user_ids
+    ]
+
+def fan_out_post(post):
+    """
+    Deliver a new post to the home timelines of its author and the author's followers.
+
+    Follower ids are streamed from mobile.Follow and written with one bulk insert per
+    TIMELINE_FANOUT_BATCH_SIZE followers. Large accounts are skipped entirely, so a post
+    from an account with millions of followers costs no writes here.
+
+    Returns the number of timeline entries written.
+    """
+    author = post.user
+    if author is None or is_large_account(author):
+        return 0
+
+    batch_size = getattr(settings, 'TIMELINE_FANOUT_BATCH_SIZE', 1000)
+    TimelineEntry.objects.bulk_create(_entries_for(post, [author.pk]), ignore_conflicts=True)
+    written = 1
+
+    follower_ids = Follow.objects.filter(following_id=author.pk).values_list('follower_id', flat=True)
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=batch_size):
+        batch.append(follower_id)
+        if len(batch) >= batch_size:
+            TimelineEntry.objects.bulk_create(_entries_for(post, batch), ignore_conflicts=True)
+            written += len(batch)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(_entries_for(post, batch), ignore_conflicts=True)
+        written += len(batch)
+    return written
+
+def backfill_timeline(follower_id, author):
+    """
+    Copy the author's most recent posts into a new follower's timeline.
+    Nothing is copied for large accounts, which are read through fan-out-on-read.
+    """
+    if is_large_account(author):
+        return 0
+    backfill_size = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 50)
+    recent_posts = Post.objects.filter(user_id=author.pk).order_by('-created_at', '-id').only('id', 'user_id', 'created_at')[:backfill_size]
+    entries = [
+        TimelineEntry(user_id=follower_id, post_id=post.pk, author_id=author.pk, post_created_at=post.created_at)
+        for post in recent_posts
+    ]
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    return len(entries)
+
+def backfill_timelines(follower_id, authors):
+    """
+    Copy the most recent posts of several authors into a new follower's timeline with one
+    SELECT and one bulk insert, the posts being ranked per author with a window function.
+    Large accounts are skipped as in backfill_timeline().
+    """
+    author_ids = [author.pk for author in authors if not is_large_account(author)]
+    if not author_ids:
+        return 0
+    backfill_size = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 50)
+    recent_posts = (
+        Post.objects.filter(user_id__in=author_ids)
+        .annotate(rank=Window(RowNumber(), partition_by=F('user_id'), order_by=[F('created_at').desc(), F('id').desc()]))
+        .filter(rank__lte=backfill_size)
+        .values_list('id', 'user_id', 'created_at')
+    )
+    entries = [
+        TimelineEntry(user_id=follower_id, post_id=post_id, author_id=author_id, post_created_at=created_at)
+        for post_id, author_id, created_at in recent_posts
+    ]
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True, batch_size=1000)
+    return len(entries)
+
+def prune_timeline(follower_id, author_id):
+    """
+    Remove an author's posts from a former follower's timeline with a single DELETE.
+    """
+    deleted, _ = TimelineEntry.objects.filter(user_id=follower_id, author_id=author_id).delete()
+    return deleted
+
+def get_home_timeline(user, request, compact=False, fields=None, expand=None):
+    """
+    Return (posts, paginator) for one page of the user's home timeline.
+
+    The page is the newest-first merge of two keyset-ordered streams sharing the same
+    (created_at, post id) cursor:
+      - the user's materialized TimelineEntry rows (fan-out-on-write), and
+      - recent posts by followed large accounts (fan-out-on-read).
+    Only forward ('next') cursors are issued; the home timeline is read as an infinite scroll.
+    """
+    paginator = KeysetPagination(ordering=('-created_at', '-id'))
+    page_size = paginator.get_page_size(request)
+    position = None
+    cursor = request.query_params.get(paginator.cursor_query_param)
+    if cursor:
+        position, reverse = paginator.decode_cursor(cursor, model=Post)
+        if reverse:
+            raise InvalidCursor("Invalid cursor.")
+
+    entries = TimelineEntry.objects.filter(user_id=user.pk)
+    if position is not None:
+        entries = entries.filter(keyset_filter(('-post_created_at', '-post_id'), position))
+    keys = set(entries.order_by('-post_created_at', '-post_id').values_list('post_created_at', 'post_id')[:page_size + 1])
+
+    User = get_user_model()
+    large_author_ids = list(
+        User.objects.filter(followers_set__follower_id=user.pk, follower_count__gte=get_fanout_limit())
+        .values_list('id', flat=True)
+    )
+    if is_large_account(user):
+        large_author_ids.append(user.pk)
+    if large_author_ids:
+        pulled = Post.objects.filter(user_id__in=large_author_ids)
+        if position is not None:
+            pulled = pulled.filter(keyset_filter(paginator.ordering, position))
+        keys.update(pulled.order_by('-created_at', '-id').values_list('created_at', 'id')[:page_size + 1])
+
+    keys = sorted(keys, reverse=True)
+    has_more = len(keys) > page_size
+    keys = keys[:page_size]
+
+    posts_by_id = Post.objects.for_feed(compact=compact, fields=fields, expand=expand).in_bulk([post_id for _, post_id in keys])
+    posts = [posts_by_id[post_id] for _, post_id in keys if post_id in posts_by_id]
+    paginator.next_position = list(keys[-1]) if keys and has_more else None
+    return posts, paginator
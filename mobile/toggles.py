@@ -0,0 +1,182 @@
+import time
+import random
+import logging
+import functools
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction, IntegrityError, OperationalError
+from mobile.cache import bump_post_version
+from mobile.suggestions import mark_stale
+from mobile.models import Post, PostLike, Follow, TimelineEntry
+from mobile.timeline import backfill_timeline, backfill_timelines, prune_timeline
+
+logger = logging.getLogger(__name__)
+
+# MySQL's deadlock error, PostgreSQL's serialization_failure and deadlock_detected SQLSTATEs.
+DEADLOCK_CODES = {1213, '40001', '40P01'}
+
+def get_deadlock_retries():
+    return getattr(settings, 'MOBILE_DEADLOCK_RETRIES', 3)
+
+def is_deadlock(error):
+    cause = error.__cause__
+    code = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None) or (error.args[0] if error.args else None)
+    return code in DEADLOCK_CODES
+
+def retry_on_deadlock(func):
+    """
+    Run a write again, up to MOBILE_DEADLOCK_RETRIES times, when the database rolled its
+    transaction back to break a deadlock.
+
+    On MySQL at REPEATABLE READ, the DELETE of a missing row takes a gap lock, and two
+    concurrent toggles of the same row then deadlock on their INSERTs (error 1213, an
+    OperationalError rather than an IntegrityError). PostgreSQL reports lock cycles between
+    counter rows the same way. The victim's transaction is gone, so it is simply replayed
+    after a short random pause. Inside a caller's atomic block the error is raised as is,
+    since only the outermost transaction can be replayed.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = get_deadlock_retries()
+        for attempt in range(retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == retries or not is_deadlock(e) or transaction.get_connection().in_atomic_block:
+                    raise
+                logger.info("%s was chosen as a deadlock victim; retrying.", func.__name__)
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+    return wrapper
+
+@retry_on_deadlock
+def toggle_like(user, post_id):
+    """
+    Like or unlike a post in one transaction, without reading the like first.
+
+    The toggle is a conditional DELETE of the user's like; only when it deletes nothing is the
+    like INSERTed. The like_count UPDATE in between doubles as the existence check for the post
+    and locks its row, so concurrent toggles of the same post are applied one after the other.
+    If a concurrent request inserts the same like first, the unique constraint rejects the
+    INSERT, the whole transaction (counter included) is rolled back and the like that won is
+    returned, so a double tap never fails and never counts twice. A deadlock between the two
+    taps (MySQL gap locks) is retried by retry_on_deadlock().
+
+    Returns the PostLike when the post ends up liked, or None when it was unliked.
+    Raises Post.DoesNotExist when there is no such post.
+    """
+    try:
+        with transaction.atomic():
+            deleted, _ = PostLike.objects.filter(user_id=user.pk, post_id=post_id).delete()
+            if deleted:
+                Post.objects.adjust_counter(post_id, 'like_count', -1)
+                bump_post_version(post_id)
+                return None
+            if not Post.objects.adjust_counter(post_id, 'like_count', 1):
+                raise Post.DoesNotExist("Post not found.")
+            like = PostLike.objects.create(user=user, post_id=post_id)
+            bump_post_version(post_id)
+            return like
+    except IntegrityError:
+        return PostLike.objects.get(user_id=user.pk, post_id=post_id)
+
+@retry_on_deadlock
+def toggle_follow(user, target_id):
+    """
+    Follow or unfollow a user in one transaction, without reading the relationship first.
+
+    Works like toggle_like(): a conditional DELETE of the relationship, and only when it deletes
+    nothing, the follower_count UPDATE of the target (which fails for an unknown user) followed
+    by the INSERT. The counters, the home timeline and the user's suggestion refresh marker are
+    kept in step in the same transaction, and a relationship created concurrently by another
+    request is returned instead of an error. That is five statements to unfollow (DELETE, two
+    counter UPDATEs, the timeline DELETE and the marker upsert) and eight to follow (DELETE,
+    counter UPDATE, target SELECT, INSERT, counter UPDATE, the backfill SELECT and INSERT and
+    the marker upsert), not counting BEGIN and COMMIT.
+
+    Returns the Follow when the user ends up following the target, or None when it was removed.
+    Raises User.DoesNotExist when there is no such target user.
+    """
+    User = get_user_model()
+    try:
+        with transaction.atomic():
+            deleted, _ = Follow.objects.filter(follower_id=user.pk, following_id=target_id).delete()
+            if deleted:
+                User.objects.adjust_counter(user.pk, 'following_count', -1)
+                User.objects.adjust_counter(target_id, 'follower_count', -1)
+                prune_timeline(user.pk, target_id)
+                mark_stale([user.pk])
+                return None
+            if not User.objects.adjust_counter(target_id, 'follower_count', 1):
+                raise User.DoesNotExist("Target user not found.")
+            target = User.objects.get(pk=target_id)
+            follow = Follow.objects.create(follower=user, following=target)
+            User.objects.adjust_counter(user.pk, 'following_count', 1)
+            backfill_timeline(user.pk, target)
+            mark_stale([user.pk])
+            return follow
+    except IntegrityError:
+        return Follow.objects.select_related('following').get(follower_id=user.pk, following_id=target_id)
+
+@retry_on_deadlock
+def bulk_follow(user, target_ids):
+    """
+    Follow several users at once and return {target id: outcome}, the outcome being one of
+    'followed', 'already_following', 'self' or 'not_found'.
+
+    The targets are validated and locked with one query, the existing relationships read with
+    another, and the new ones written with one bulk INSERT that ignores conflicts. Follows
+    created by toggle_follow() lock the target first too, so none can slip in between the read
+    and the INSERT; the relationships actually inserted are read back all the same, and only
+    those move the counters (one UPDATE per side) and are backfilled into the user's timeline
+    (one SELECT and one bulk INSERT for all targets).
+    """
+    User = get_user_model()
+    target_ids = list(dict.fromkeys(target_ids))
+    outcomes = {target_id: 'not_found' for target_id in target_ids}
+    if user.pk in outcomes:
+        outcomes[user.pk] = 'self'
+    with transaction.atomic():
+        targets = {
+            target.pk: target
+            for target in User.objects.select_for_update().filter(pk__in=set(target_ids) - {user.pk}, is_active=True)
+            .order_by('pk').only('id', 'follower_count')
+        }
+        following = Follow.objects.filter(follower_id=user.pk, following_id__in=targets)
+        existing = set(following.values_list('following_id', flat=True))
+        new_ids = [target_id for target_id in targets if target_id not in existing]
+        if new_ids:
+            Follow.objects.bulk_create(
+                [Follow(follower_id=user.pk, following_id=target_id) for target_id in new_ids], ignore_conflicts=True
+            )
+            new_ids = list(following.exclude(following_id__in=existing).values_list('following_id', flat=True))
+        if new_ids:
+            User.objects.adjust_counters(new_ids, 'follower_count', 1)
+            User.objects.adjust_counter(user.pk, 'following_count', len(new_ids))
+            backfill_timelines(user.pk, [targets[target_id] for target_id in new_ids])
+            mark_stale([user.pk])
+    for target_id in targets:
+        outcomes[target_id] = 'already_following' if target_id in existing else 'followed'
+    return outcomes
+
+@retry_on_deadlock
+def bulk_unfollow(user, target_ids):
+    """
+    Unfollow several users at once and return {target id: outcome}, the outcome being one of
+    'unfollowed' or 'not_following'.
+
+    The relationships are read with one query and removed with a single filtered DELETE,
+    followed by one counter UPDATE per side and one DELETE of the targets' timeline entries.
+    """
+    User = get_user_model()
+    target_ids = list(dict.fromkeys(target_ids))
+    with transaction.atomic():
+        relationships = Follow.objects.filter(follower_id=user.pk, following_id__in=target_ids)
+        removed = list(relationships.values_list('following_id', flat=True))
+        if removed:
+            Follow.objects.filter(follower_id=user.pk, following_id__in=removed).delete()
+            User.objects.adjust_counters(removed, 'follower_count', -1)
+            User.objects.adjust_counter(user.pk, 'following_count', -len(removed))
+            TimelineEntry.objects.filter(user_id=user.pk, author_id__in=removed).delete()
+            mark_stale([user.pk])
+    removed = set(removed)
+    return {target_id: 'unfollowed' if target_id in removed else 'not_following' for target_id in target_ids}
@@ -10,6 +10,9 @@ urlpatterns = [
     path('category/<int:pk>/', CategoryDetails.as_view(), name='CategoryDetails'),
 
     path('posts/', GetPosts.as_view(), name='GetPosts'),
+    path('timeline/', HomeTimeline.as_view(), name='HomeTimeline'),
+    path('posts/search/', SearchPosts.as_view(), name='SearchPosts'),
+    path('posts/export/', ExportPosts.as_view(), name='ExportPosts'),
     path('post/add/', AddPost.as_view(), name='AddPost'),
     path('post/<int:pk>/', PostDetails.as_view(), name='PostDetails'),
     path('post/<int:pk>/update/', UpdatePost.as_view(), name='UpdatePost'),
@@ -17,12 +20,18 @@ urlpatterns = [
     path('posts/user/<int:user_id>/', GetUserPosts.as_view(), name='GetUserPosts'),
 
     path('post/<int:post_id>/like/', TogglePostLike.as_view(), name='TogglePostLike'),
+    path('post/<int:post_id>/likes/', PostLikes.as_view(), name='PostLikes'),
 
+    path('post/<int:post_id>/comments/', PostComments.as_view(), name='PostComments'),
     path('post/<int:post_id>/comment/add/', AddPostComment.as_view(), name='AddPostComment'),
     path('post/comment/<int:pk>/update/', UpdatePostComment.as_view(), name='UpdatePostComment'),
     path('post/comment/<int:pk>/delete/', DeletePostComment.as_view(), name='DeletePostComment'),
 
+    path('users/search/', SearchUsers.as_view(), name='SearchUsers'),
+    path('users/relationships/', UserRelationships.as_view(), name='UserRelationships'),
+    path('user/suggestions/', UserSuggestions.as_view(), name='UserSuggestions'),
     path('user/<int:user_id>/toggle-follow/', ToggleFollowView.as_view(), name='ToggleFollow'),
+    path('user/follows/bulk/', BulkFollowView.as_view(), name='BulkFollow'),
     path('user/<int:user_id>/followers/', UserFollowListView.as_view(), name='UserFollowList'),
     path('user/<int:user_id>/following/', UserFollowingUsersView.as_view(), name='UserFollowingUsers'),
 
@@ -30,4 +39,6 @@ urlpatterns = [
     path('message/<int:pk>/', MessageDetailView.as_view(), name='MessageDetail'),
     path('user/<int:user_id>/inbox/', UserInboxView.as_view(), name='UserInbox'),
     path('message/history/<int:user_id>/', MessageHistoryView.as_view(), name='MessageHistory'),
+    path('conversation/<int:user_id>/read/', MarkConversationRead.as_view(), name='MarkConversationRead'),
+    path('messages/export/', ExportMessages.as_view(), name='ExportMessages'),
 ]  + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
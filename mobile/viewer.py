@@ -0,0 +1,90 @@
+from django.conf import settings
+from mobile.models import PostLike, Follow
+from mobile.like_buffer import get_pending_likes
+
+VIEWER_FIELDS = ('is_liked', 'is_author_followed', 'is_own_post')
+
+def post_keys(posts):
+    """
+    The (post id, author id) pairs add_viewer_state() needs, in the order of ``posts``.
+    Kept next to cached bodies, because a sparse representation may omit either value.
+    """
+    return [(post.pk, post.user_id) for post in posts]
+
+def get_viewer_state(user, keys):
+    """
+    Return (liked post ids, followed author ids) for the viewer among the given (post id, author id)
+    pairs, with one query against PostLike and one against Follow, however many posts there are.
+    Anonymous viewers have no state and cost no query.
+    """
+    if not keys or not user.is_authenticated:
+        return set(), set()
+    post_ids = {post_id for post_id, _ in keys}
+    author_ids = {author_id for _, author_id in keys if author_id is not None and author_id != user.pk}
+    liked = set(PostLike.objects.filter(user_id=user.pk, post_id__in=post_ids).values_list('post_id', flat=True))
+    # Toggles still waiting in the like buffer win over the database.
+    for post_id, pending in get_pending_likes(user.pk, post_ids).items():
+        if pending:
+            liked.add(post_id)
+        else:
+            liked.discard(post_id)
+    followed = set()
+    if author_ids:
+        followed = set(
+            Follow.objects.filter(follower_id=user.pk, following_id__in=author_ids).values_list('following_id', flat=True)
+        )
+    return liked, followed
+
+def add_viewer_state(data, keys, user, fields=None):
+    """
+    Return copies of the rendered posts in ``data`` with the viewer-relative fields appended:
+      - is_liked: the viewer likes the post.
+      - is_author_followed: the viewer follows the post's author.
+      - is_own_post: the viewer wrote the post.
+    ``data`` may be shared (e.g. a cached body) and is never modified. With a ?fields= selection
+    only the viewer fields it names are added, and nothing is queried when it names none.
+    """
+    names = [name for name in VIEWER_FIELDS if fields is None or name in fields]
+    if not names:
+        return data
+    liked, followed = get_viewer_state(user, keys)
+    viewer_id = user.pk if user.is_authenticated else None
+    result = []
+    for post, (post_id, author_id) in zip(data, keys):
+        state = {
+            'is_liked': post_id in liked,
+            'is_author_followed': author_id in followed,
+            'is_own_post': viewer_id is not None and author_id == viewer_id,
+        }
+        result.append({**post, **{name: state[name] for name in names}})
+    return result
+
+def get_relationships_max_ids():
+    return getattr(settings, 'MOBILE_RELATIONSHIPS_MAX_IDS', 100)
+
+def get_relationships(user, user_ids):
+    """
+    Return {user id: {'following', 'followed_by', 'mutual'}} for the viewer and each of ``user_ids``:
+      - following: the viewer follows the user.
+      - followed_by: the user follows the viewer.
+      - mutual: both.
+    Both directions are answered with one IN query each, served by the unique
+    (follower, following) index of Follow.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id != user.pk}
+    following, followed_by = set(), set()
+    if user_ids:
+        following = set(
+            Follow.objects.filter(follower_id=user.pk, following_id__in=user_ids).values_list('following_id', flat=True)
+        )
+        followed_by = set(
+            Follow.objects.filter(follower_id__in=user_ids, following_id=user.pk).values_list('follower_id', flat=True)
+        )
+    return {
+        user_id: {
+            'following': user_id in following,
+            'followed_by': user_id in followed_by,
+            'mutual': user_id in following and user_id in followed_by,
+        }
+        for user_id in user_ids
+    }
@@ -1,12 +1,26 @@
 from base.models import *
+from mobile.cache import *
 from mobile.models import *
 from base.serializers import *
-from django.db.models import Q
+from mobile.conditional import *
+from django.db import transaction
+from django.db.models import Q, Exists, OuterRef, Prefetch
 from mobile.serializers import *
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from mobile import like_buffer
+from mobile.toggles import toggle_like, toggle_follow, bulk_follow, bulk_unfollow
+from mobile.conversations import get_inbox, get_history, get_unread_total, mark_read, send_message, edit_message, delete_message
+from mobile.suggestions import get_suggestions_size
+from mobile.search import search_posts, search_users, get_user_search_limit
+from mobile.viewer import post_keys, add_viewer_state, get_relationships, get_relationships_max_ids
+from mobile.timeline import fan_out_post, get_home_timeline
+from mobile.pagination import KeysetPagination, InvalidCursor
+from mobile.export import NDJSON_CONTENT_TYPE, stream, parse_since_id, export_posts, export_messages
+from mobile.fast_serializers import serialize_posts, serialize_users, serialize_conversations, FastUserSerializer, FastPostLikeSerializer, FastPostCommentSerializer
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
 class GetCategories(APIView):
@@ -16,9 +30,12 @@ class GetCategories(APIView):
     """
     permission_classes = [AllowAny]
 
+    @conditional_get(categories_validators)
     def get(self, request, *args, **kwargs):
         try:
-            categories = Category.objects.all().order_by('-id')
+            categories = Category.objects.prefetch_related(
+                Prefetch('posts', queryset=Post.objects.for_feed())
+            ).order_by('-id')
             serializer = CategorySerializer(categories, many=True)
             return Response({
                 "detail": "Categories retrieved successfully.",
@@ -37,9 +54,12 @@ class CategoryDetails(APIView):
     """
     permission_classes = [AllowAny]
 
+    @conditional_get(category_detail_validators)
     def get(self, request, pk, *args, **kwargs):
         try:
-            category = Category.objects.get(pk=pk)
+            category = Category.objects.prefetch_related(
+                Prefetch('posts', queryset=Post.objects.for_feed())
+            ).get(pk=pk)
             serializer = CategorySerializer(category)
             return Response({
                 "detail": "Category details retrieved successfully.",
@@ -57,26 +77,152 @@ class CategoryDetails(APIView):
 
 class GetPosts(APIView):
     """
-    Retrieve a list of all posts with detailed information including likes and comments.
+    Retrieve a page of posts with detailed information including likes and comments.
     This endpoint is publicly accessible.
+
+    Posts are ordered newest first and paginated with opaque cursors over (created_at, id):
+      - ?page_size=<n> controls the number of posts per page (capped by MOBILE_MAX_PAGE_SIZE).
+      - ?cursor=<token> fetches the page referenced by a previous 'next' or 'prev' value.
+      - ?compact=true returns 'like_count'/'comment_count' instead of the likes and comments arrays.
+      - ?fields=<a,b> and ?expand=<relation,...> select a sparse representation (see DynamicFieldsMixin).
+    Each post also carries 'is_liked', 'is_author_followed' and 'is_own_post' for the requesting
+    user (all false for anonymous requests).
     """
     permission_classes = [AllowAny]
 
     def get(self, request, *args, **kwargs):
+        def build():
+            compact = request.query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+            fields, expand = parse_sparse_params(request)
+            paginator = KeysetPagination(ordering=('-created_at', '-id'))
+            queryset = Post.objects.for_feed(compact=compact, fields=fields, expand=expand)
+            posts = paginator.paginate_queryset(queryset, request)
+            # Pass the request to build absolute URLs
+            data = serialize_posts(posts, request, many=True, compact=compact, fields=fields, expand=expand)
+            return {"data": data, "keys": post_keys(posts), **paginator.get_page_links()}
+
         try:
-            posts = Post.objects.all().order_by('-created_at')
-            # Pass the request context to build absolute URLs
-            serializer = PostSerializer(posts, many=True, context={'request': request})
+            # Pages are cached per URL, invalidated when a post is created or one of their own posts changes.
+            body = dict(get_or_build(
+                build_cache_key('mobile:feed', request), FEED_VERSION_KEY, build,
+                item_version_keys=lambda body: [post_version_key(post_id) for post_id, _ in body["keys"]],
+            ))
+            # The cached page is shared by every viewer, so viewer-relative fields are added afterwards.
+            keys = body.pop("keys")
+            body["data"] = add_viewer_state(body["data"], keys, request.user, parse_sparse_params(request)[0])
             return Response({
                 "detail": "Posts retrieved successfully.",
-                "data": serializer.data
+                **body
             }, status=status.HTTP_200_OK)
+        except InvalidCursor as e:
+            return Response({
+                "detail": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 "detail": "An error occurred while retrieving posts.",
                 "error": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class HomeTimeline(APIView):
+    """
+    Retrieve the logged-in user's home timeline: their own posts and posts from the users they follow.
+
+    Posts are ordered newest first. Pass the returned 'next' value as ?cursor=<token> to load
+    older posts, and ?compact=true for the counters-only representation.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            compact = request.query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+            fields, expand = parse_sparse_params(request)
+            posts, paginator = get_home_timeline(request.user, request, compact=compact, fields=fields, expand=expand)
+            data = serialize_posts(posts, request, many=True, compact=compact, fields=fields, expand=expand)
+            return Response({
+                "detail": "Home timeline retrieved successfully.",
+                "data": add_viewer_state(data, post_keys(posts), request.user, fields),
+                **paginator.get_page_links()
+            }, status=status.HTTP_200_OK)
+        except InvalidCursor as e:
+            return Response({
+                "detail": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                "detail": "An error occurred while retrieving the home timeline.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class SearchPosts(APIView):
+    """
+    Full-text search over post titles and descriptions, best match first.
+    This endpoint is publicly accessible.
+
+    - ?q=<terms> is required. On PostgreSQL it accepts websearch syntax ("a phrase", -excluded, or).
+    - ?category=<id> restricts the results to one category.
+    - ?cursor=<token> (the returned 'next' value) and ?page_size=<n> page through the results.
+    - ?compact=true, ?fields= and ?expand= work as in GetPosts.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            return Response({
+                "detail": "The 'q' query parameter is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            category_id = request.query_params.get('category')
+            category_id = int(category_id) if category_id else None
+        except ValueError:
+            return Response({
+                "detail": "category must be a category id."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            compact = request.query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+            fields, expand = parse_sparse_params(request)
+            post_ids, paginator = search_posts(request, terms, category_id)
+            posts_by_id = Post.objects.for_feed(compact=compact, fields=fields, expand=expand).in_bulk(post_ids)
+            posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+            data = serialize_posts(posts, request, many=True, compact=compact, fields=fields, expand=expand)
+            return Response({
+                "detail": "Search results retrieved successfully.",
+                "data": add_viewer_state(data, post_keys(posts), request.user, fields),
+                **paginator.get_page_links()
+            }, status=status.HTTP_200_OK)
+        except InvalidCursor as e:
+            return Response({
+                "detail": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                "detail": "An error occurred while searching posts.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ExportPosts(APIView):
+    """
+    Stream every post as newline-delimited JSON (one GetPosts representation per line), oldest first.
+    Accessible only to authenticated users.
+
+    Memory use stays flat however many posts are exported. An interrupted export is resumed
+    by passing the id of the last post received as ?since_id=<id>. ?compact=true exports
+    'like_count'/'comment_count' instead of the likes and comments arrays.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since_id = parse_since_id(request)
+        except ValueError:
+            return Response({
+                "detail": "since_id must be a non-negative integer."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        compact = request.query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+        return StreamingHttpResponse(stream(request, export_posts(request, since_id, compact=compact)), content_type=NDJSON_CONTENT_TYPE)
+
 class AddPost(APIView):
     """
     Create a new post. Only authenticated users can create a post.
@@ -90,6 +236,9 @@ class AddPost(APIView):
         if serializer.is_valid():
             try:
                 post = serializer.save()
+                # Deliver the post to the home timelines of the author's followers.
+                fan_out_post(post)
+                bump_feed_version()
                 return Response({
                     "detail": "Post created successfully.",
                     "data": PostSerializer(post, context={'request': request}).data
@@ -111,14 +260,21 @@ class PostDetails(APIView):
     """
     permission_classes = [AllowAny]
 
+    @conditional_get(post_detail_validators)
     def get(self, request, pk, *args, **kwargs):
+        def build():
+            fields, expand = parse_sparse_params(request)
+            post = get_object_or_404(Post.objects.for_feed(fields=fields, expand=expand), pk=pk)
+            # Pass the request to build absolute URLs in nested representations
+            return {"data": serialize_posts(post, request, fields=fields, expand=expand), "keys": post_keys([post])}
+
         try:
-            post = get_object_or_404(Post, pk=pk)
-            # Pass the request context to build absolute URLs in nested serializers
-            serializer = PostSerializer(post, context={'request': request})
+            # The body is cached until the post, its images, likes or comments change.
+            body = get_or_build(build_cache_key(f'mobile:post:{pk}', request), post_version_key(pk), build)
+            data = add_viewer_state([body["data"]], body["keys"], request.user, parse_sparse_params(request)[0])
             return Response({
                 "detail": "Post details retrieved successfully.",
-                "data": serializer.data
+                "data": data[0]
             }, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({
@@ -144,9 +300,10 @@ class UpdatePost(APIView):
         if serializer.is_valid():
             try:
                 updated_post = serializer.save()  # updated_at is auto-triggered here.
+                bump_post_version(updated_post.pk)
                 return Response({
                     "detail": "Post updated successfully.",
-                    "data": PostSerializer(updated_post).data
+                    "data": PostSerializer(Post.objects.for_feed().get(pk=updated_post.pk)).data
                 }, status=status.HTTP_200_OK)
             except Exception as e:
                 return Response({
@@ -168,9 +325,10 @@ class UpdatePost(APIView):
         if serializer.is_valid():
             try:
                 updated_post = serializer.save()  # updated_at is auto-triggered here.
+                bump_post_version(updated_post.pk)
                 return Response({
                     "detail": "Post updated successfully.",
-                    "data": PostSerializer(updated_post).data
+                    "data": PostSerializer(Post.objects.for_feed().get(pk=updated_post.pk)).data
                 }, status=status.HTTP_200_OK)
             except Exception as e:
                 return Response({
@@ -195,7 +353,9 @@ class DeletePost(APIView):
                 "detail": "Permission denied: You are not the owner of this post."
             }, status=status.HTTP_403_FORBIDDEN)
         try:
+            post_id = post.pk
             post.delete()
+            bump_post_version(post_id)
             return Response({
                 "detail": "Post deleted successfully."
             }, status=status.HTTP_200_OK)
@@ -215,15 +375,14 @@ class GetUserPosts(APIView):
     """
     permission_classes = [AllowAny]
 
+    @conditional_get(user_posts_validators)
     def get(self, request, user_id, *args, **kwargs):
         try:
-            posts = Post.objects.filter(user_id=user_id).order_by('-created_at')
             User = get_user_model()
-            if posts.exists():
-                user = posts.first().user
-            else:
-                user = get_object_or_404(User, pk=user_id)
-            serializer = PostSerializer(posts, many=True, context={'request': request})
+            user = get_object_or_404(User, pk=user_id)
+            fields, expand = parse_sparse_params(request)
+            posts = Post.objects.for_feed(fields=fields, expand=expand).filter(user_id=user_id).order_by('-created_at')
+            serializer = PostSerializer(posts, many=True, fields=fields, expand=expand, context={'request': request})
             serialized_posts = serializer.data
             # Remove the redundant 'user' key from each post object
             for post in serialized_posts:
@@ -231,7 +390,7 @@ class GetUserPosts(APIView):
             return Response({
                 "detail": "Posts for the user retrieved successfully.",
                 "user": UserSerializer(user, context={'request': request}).data,
-                "posts": serialized_posts
+                "posts": add_viewer_state(serialized_posts, post_keys(posts), request.user, fields)
             }, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({
@@ -246,27 +405,74 @@ class TogglePostLike(APIView):
     If the logged-in user has already liked the post, the like is removed.
     If not, a new like is created.
     This endpoint ensures that a user can only like a post once and toggles the like state.
+    With MOBILE_LIKE_BUFFER enabled the toggle is journaled and written by the like buffer instead.
     """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, post_id, *args, **kwargs):
-        user = request.user
+        if like_buffer.is_enabled():
+            return self.post_buffered(request, post_id)
         try:
-            post = Post.objects.get(id=post_id)
+            like = toggle_like(request.user, post_id)
         except Post.DoesNotExist:
             return Response({"detail": "Post not found."}, status=status.HTTP_404_NOT_FOUND)
-        
-        existing_like = PostLike.objects.filter(user=user, post=post).first()
-        if existing_like:
-            existing_like.delete()
+
+        if like is None:
             return Response({"detail": "Like removed."}, status=status.HTTP_200_OK)
-        else:
-            like = PostLike.objects.create(user=user, post=post)
-            serializer = PostLikeSerializer(like, context={'request': request})
+        serializer = PostLikeSerializer(like, context={'request': request})
+        return Response({
+            "detail": "Post liked successfully.",
+            "data": serializer.data
+        }, status=status.HTTP_201_CREATED)
+
+    def post_buffered(self, request, post_id):
+        """
+        Acknowledge the toggle from the write-behind like buffer (MOBILE_LIKE_BUFFER).
+        The like is written by the next flush, hence 202 Accepted and no like id.
+        """
+        try:
+            liked = like_buffer.toggle_like_buffered(request.user, post_id)
+        except Post.DoesNotExist:
+            return Response({"detail": "Post not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            "detail": "Post liked successfully." if liked else "Like removed.",
+            "data": {"post": post_id, "is_liked": liked}
+        }, status=status.HTTP_202_ACCEPTED)
+
+class PostLikes(APIView):
+    """
+    Retrieve the users who liked a post, newest first, with cursor pagination.
+    This endpoint is publicly accessible.
+
+    Pages are located with opaque cursors (?cursor=<token>, ?page_size=<n>) over
+    (created_at, id), served by the (post, created_at, id) index of PostLike.
+    With ?order=friends an authenticated viewer gets the likers they follow first.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, post_id, *args, **kwargs):
+        post = get_object_or_404(Post.objects.only('id', 'like_count'), pk=post_id)
+        likes = PostLike.objects.filter(post_id=post.pk).select_related('user')
+        ordering = ('-created_at', '-id')
+        if request.query_params.get('order') == 'friends' and request.user.is_authenticated:
+            likes = likes.annotate(
+                is_followed=Exists(Follow.objects.filter(follower_id=request.user.pk, following_id=OuterRef('user_id')))
+            )
+            ordering = ('-is_followed', '-created_at', '-id')
+
+        try:
+            paginator = KeysetPagination(ordering=ordering)
+            page = paginator.paginate_queryset(likes, request)
+        except InvalidCursor as e:
             return Response({
-                "detail": "Post liked successfully.",
-                "data": serializer.data
-            }, status=status.HTTP_201_CREATED)
+                "detail": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "detail": "Post likes retrieved successfully.",
+            "count": post.like_count,
+            "data": FastPostLikeSerializer(page, many=True, context={'request': request}).data,
+            **paginator.get_page_links()
+        }, status=status.HTTP_200_OK)
 
 class AddPostComment(APIView):
     """
@@ -282,7 +488,10 @@ class AddPostComment(APIView):
         serializer = PostCommentSerializer(data=data, context={'request': request})
         if serializer.is_valid():
             try:
-                comment = serializer.save()
+                with transaction.atomic():
+                    comment = serializer.save()
+                    Post.objects.adjust_counter(comment.post_id, 'comment_count', 1)
+                    bump_post_version(comment.post_id)
                 return Response({
                     "detail": "Comment added successfully.",
                     "data": PostCommentSerializer(comment, context={'request': request}).data
@@ -297,6 +506,39 @@ class AddPostComment(APIView):
             "errors": serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+class PostComments(APIView):
+    """
+    Retrieve the comments of a post with cursor pagination.
+    This endpoint is publicly accessible.
+
+    Comments are returned newest first, or oldest first with ?order=oldest. Pages are located
+    with opaque cursors (?cursor=<token>, ?page_size=<n>) over (created_at, id), served by the
+    (post, created_at, id) index of PostComment.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, post_id, *args, **kwargs):
+        post = get_object_or_404(Post.objects.only('id', 'comment_count'), pk=post_id)
+        comments = PostComment.objects.filter(post_id=post.pk).select_related('user')
+        if request.query_params.get('order') == 'oldest':
+            ordering = ('created_at', 'id')
+        else:
+            ordering = ('-created_at', '-id')
+
+        try:
+            paginator = KeysetPagination(ordering=ordering)
+            page = paginator.paginate_queryset(comments, request)
+        except InvalidCursor as e:
+            return Response({
+                "detail": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "detail": "Post comments retrieved successfully.",
+            "count": post.comment_count,
+            "data": FastPostCommentSerializer(page, many=True, context={'request': request}).data,
+            **paginator.get_page_links()
+        }, status=status.HTTP_200_OK)
+
 class UpdatePostComment(APIView):
     """
     Update an existing comment.
@@ -314,6 +556,7 @@ class UpdatePostComment(APIView):
         if serializer.is_valid():
             try:
                 updated_comment = serializer.save()
+                bump_post_version(updated_comment.post_id)
                 return Response({
                     "detail": "Comment updated successfully.",
                     "data": PostCommentSerializer(updated_comment, context={'request': request}).data
@@ -337,6 +580,7 @@ class UpdatePostComment(APIView):
         if serializer.is_valid():
             try:
                 updated_comment = serializer.save()
+                bump_post_version(updated_comment.post_id)
                 return Response({
                     "detail": "Comment updated successfully.",
                     "data": PostCommentSerializer(updated_comment, context={'request': request}).data
@@ -364,7 +608,10 @@ class DeletePostComment(APIView):
             return Response({"detail": "Permission denied: You are not the owner of this comment."},
                             status=status.HTTP_403_FORBIDDEN)
         try:
-            comment.delete()
+            with transaction.atomic():
+                comment.delete()
+                Post.objects.adjust_counter(comment.post_id, 'comment_count', -1)
+                bump_post_version(comment.post_id)
             return Response({"detail": "Comment deleted successfully."}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({
@@ -372,6 +619,97 @@ class DeletePostComment(APIView):
                 "error": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class SearchUsers(APIView):
+    """
+    Typeahead search of users by the start of their name, username or phone number,
+    case-insensitively. Users the requester follows come first.
+
+    - ?q=<prefix> is required.
+    - ?limit=<n> caps the number of results (10 by default, at most 50).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            return Response({
+                "detail": "The 'q' query parameter is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            users, followed_ids = search_users(request.user, terms, get_user_search_limit(request))
+            serializer = FastUserSerializer(users, many=True, context={'request': request})
+            return Response({
+                "detail": "Users retrieved successfully.",
+                "data": [
+                    {**user, 'is_followed': user['id'] in followed_ids} for user in serializer.data
+                ]
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({
+                "detail": "An error occurred while searching users.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class UserRelationships(APIView):
+    """
+    Retrieve the follow relationship between the requester and a batch of users.
+
+    - ?ids=<id>,<id>,... is required, with at most MOBILE_RELATIONSHIPS_MAX_IDS (100) ids.
+
+    Each item has the user's id and the 'following', 'followed_by' and 'mutual' flags, in the
+    order of ?ids=. The requester's own id gets false for all three.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        max_ids = get_relationships_max_ids()
+        try:
+            user_ids = [int(user_id) for user_id in request.query_params.get('ids', '').split(',') if user_id.strip()]
+        except ValueError:
+            return Response({
+                "detail": "ids must be a comma-separated list of user ids."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not user_ids:
+            return Response({
+                "detail": "The 'ids' query parameter is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        user_ids = list(dict.fromkeys(user_ids))
+        if len(user_ids) > max_ids:
+            return Response({
+                "detail": f"At most {max_ids} ids can be looked up at once."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        relationships = get_relationships(request.user, user_ids)
+        none = {'following': False, 'followed_by': False, 'mutual': False}
+        return Response({
+            "detail": "Relationships retrieved successfully.",
+            "data": [{'id': user_id, **relationships.get(user_id, none)} for user_id in user_ids]
+        }, status=status.HTTP_200_OK)
+
+class UserSuggestions(APIView):
+    """
+    Retrieve "people you may know" suggestions for the requester: users followed by the most
+    of the people they follow, with that number as 'mutual_count'.
+
+    Suggestions are precomputed by the compute_suggestions management command and read here
+    with one indexed query. Users followed since then are left out.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        suggestions = FollowSuggestion.objects.filter(user_id=request.user.pk, suggested__is_active=True).exclude(
+            Exists(Follow.objects.filter(follower_id=request.user.pk, following_id=OuterRef('suggested_id')))
+        ).select_related('suggested').order_by('-mutual_count', 'suggested_id')[:get_suggestions_size()]
+        suggestions = list(suggestions)
+        users = FastUserSerializer([suggestion.suggested for suggestion in suggestions], many=True, context={'request': request}).data
+        return Response({
+            "detail": "Suggestions retrieved successfully.",
+            "data": [
+                {**user, 'mutual_count': suggestion.mutual_count} for user, suggestion in zip(users, suggestions)
+            ]
+        }, status=status.HTTP_200_OK)
+
 class ToggleFollowView(APIView):
     """
     Toggle the follow status for a user.
@@ -382,90 +720,120 @@ class ToggleFollowView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, user_id, *args, **kwargs):
+        if request.user.pk == user_id:
+            return Response({"detail": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            target_user = User.objects.get(id=user_id)
+            follow_relationship = toggle_follow(request.user, user_id)
         except User.DoesNotExist:
             return Response({"detail": "Target user not found."}, status=status.HTTP_404_NOT_FOUND)
-        
-        if request.user == target_user:
-            return Response({"detail": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        follow_relationship = Follow.objects.filter(follower=request.user, following=target_user).first()
-        if follow_relationship:
-            # Unfollow: delete the relationship
-            follow_relationship.delete()
+
+        if follow_relationship is None:
             return Response({"detail": "Successfully unfollowed the user."}, status=status.HTTP_200_OK)
-        else:
-            # Follow: create a new follow relationship
-            follow_relationship = Follow.objects.create(follower=request.user, following=target_user)
-            serializer = FollowSerializer(follow_relationship, context={'request': request})
+        serializer = FollowSerializer(follow_relationship, context={'request': request})
+        return Response({
+            "detail": "User followed successfully.",
+            "data": serializer.data
+        }, status=status.HTTP_201_CREATED)
+
+class BulkFollowView(APIView):
+    """
+    Follow or unfollow several users in one request, e.g. after a contact import.
+
+    Expects {"action": "follow" | "unfollow", "user_ids": [...]} with at most
+    MOBILE_BULK_FOLLOW_MAX_IDS (100) ids, and returns the outcome for each id in request order:
+    'followed', 'already_following', 'self' or 'not_found' for a follow, and 'unfollowed' or
+    'not_following' for an unfollow.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkFollowSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response({
-                "detail": "User followed successfully.",
-                "data": serializer.data
-            }, status=status.HTTP_201_CREATED)
+                "detail": "Bulk follow failed.",
+                "errors": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        action = serializer.validated_data['action']
+        user_ids = serializer.validated_data['user_ids']
+        if action == 'follow':
+            outcomes = bulk_follow(request.user, user_ids)
+        else:
+            outcomes = bulk_unfollow(request.user, user_ids)
+        return Response({
+            "detail": "Follow relationships updated successfully.",
+            "data": [{'id': user_id, 'status': outcome} for user_id, outcome in outcomes.items()]
+        }, status=status.HTTP_200_OK)
 
 class UserFollowListView(APIView):
     """
-    Retrieve the list of users that follow the specified user.
+    Retrieve the users that follow the specified user, most recent first, with cursor pagination.
 
-    This endpoint aggregates the 'follower' users from the Follow relationships
-    where the specified user is being followed, ensuring that any duplicate entries are removed,
-    and returns a clean list of user details.
+    Pages are located with opaque cursors (?cursor=<token>, ?page_size=<n>) over
+    (created_at, id), served by the (following, created_at, id) index of Follow, so a page
+    costs the same whatever the number of followers. The count is the user's denormalized
+    follower_count.
     """
     permission_classes = [AllowAny]
 
     def get(self, request, user_id, *args, **kwargs):
         try:
-            target_user = User.objects.get(id=user_id)
+            target_user = User.objects.only('id', 'follower_count').get(id=user_id)
         except User.DoesNotExist:
             return Response(
                 {"detail": "User not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        # Retrieve follow relationships where the target user is being followed.
-        follow_relationships = Follow.objects.filter(following=target_user)
-        # Extract the follower users and remove duplicates
-        follower_users = [relation.follower for relation in follow_relationships]
-        unique_followers = {user.id: user for user in follower_users}.values()
-        
-        serializer = UserSerializer(unique_followers, many=True, context={'request': request})
-        
+
+        try:
+            paginator = KeysetPagination(ordering=('-created_at', '-id'))
+            follows = Follow.objects.filter(following_id=target_user.pk).select_related('follower')
+            followers = [relation.follower for relation in paginator.paginate_queryset(follows, request)]
+        except InvalidCursor as e:
+            return Response({
+                "detail": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         return Response({
             "detail": "Followers list retrieved successfully.",
-            "count": len(unique_followers),
-            "users": serializer.data
+            "count": target_user.follower_count,
+            "users": serialize_users(followers, request, many=True, fields=parse_sparse_params(request)[0]),
+            **paginator.get_page_links()
         }, status=status.HTTP_200_OK)
 
 class UserFollowingUsersView(APIView):
     """
-    Retrieve a list of users that the specified user is following.
-    
-    This endpoint returns user details for each user that the given user has followed.
-    Duplicate entries are removed for safety.
+    Retrieve the users that the specified user is following, most recent first, with cursor pagination.
+
+    Pages work as in UserFollowListView, served by the (follower, created_at, id) index of
+    Follow. The count is the user's denormalized following_count.
     """
     permission_classes = [AllowAny]
 
     def get(self, request, user_id, *args, **kwargs):
         try:
-            target_user = User.objects.get(id=user_id)
+            target_user = User.objects.only('id', 'following_count').get(id=user_id)
         except User.DoesNotExist:
             return Response(
                 {"detail": "User not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        # Retrieve follow relationships where the target user is the follower.
-        follow_relationships = Follow.objects.filter(follower=target_user)
-        following_users = [relation.following for relation in follow_relationships]
-        # Remove duplicates by using a dict keyed by user ID (just in case)
-        unique_following = {user.id: user for user in following_users}.values()
-        serializer = UserSerializer(unique_following, many=True, context={'request': request})
-        
+
+        try:
+            paginator = KeysetPagination(ordering=('-created_at', '-id'))
+            follows = Follow.objects.filter(follower_id=target_user.pk).select_related('following')
+            following = [relation.following for relation in paginator.paginate_queryset(follows, request)]
+        except InvalidCursor as e:
+            return Response({
+                "detail": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         return Response({
             "detail": "List of followed users retrieved successfully.",
-            "count": len(unique_following),
-            "users": serializer.data
+            "count": target_user.following_count,
+            "users": serialize_users(following, request, many=True, fields=parse_sparse_params(request)[0]),
+            **paginator.get_page_links()
         }, status=status.HTTP_200_OK)
 
 class MessageSendView(APIView):
@@ -477,7 +845,7 @@ class MessageSendView(APIView):
     def post(self, request, *args, **kwargs):
         serializer = MessageCreateSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            message = serializer.save()
+            message = send_message(serializer)
             output_serializer = MessageSerializer(message, context={'request': request})
             return Response({
                 "detail": "Message sent successfully.",
@@ -507,7 +875,8 @@ class MessageDetailView(APIView):
 
     def get(self, request, pk, *args, **kwargs):
         message = self.get_object(pk, request)
-        serializer = MessageSerializer(message, context={'request': request})
+        fields, expand = parse_sparse_params(request)
+        serializer = MessageSerializer(message, fields=fields, expand=expand, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def put(self, request, pk, *args, **kwargs):
@@ -516,7 +885,7 @@ class MessageDetailView(APIView):
             return Response({"detail": "You can only edit messages you have sent."}, status=status.HTTP_403_FORBIDDEN)
         serializer = MessageCreateSerializer(message, data=request.data, context={'request': request})
         if serializer.is_valid():
-            updated_message = serializer.save()
+            updated_message = edit_message(serializer)
             output_serializer = MessageSerializer(updated_message, context={'request': request})
             return Response({
                 "detail": "Message updated successfully.",
@@ -533,7 +902,7 @@ class MessageDetailView(APIView):
             return Response({"detail": "You can only edit messages you have sent."}, status=status.HTTP_403_FORBIDDEN)
         serializer = MessageCreateSerializer(message, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
-            updated_message = serializer.save()
+            updated_message = edit_message(serializer)
             output_serializer = MessageSerializer(updated_message, context={'request': request})
             return Response({
                 "detail": "Message updated successfully.",
@@ -548,68 +917,118 @@ class MessageDetailView(APIView):
         message = self.get_object(pk, request)
         if request.user not in [message.sender, message.receiver]:
             return Response({"detail": "You are not permitted to delete this message."}, status=status.HTTP_403_FORBIDDEN)
-        message.delete()
+        delete_message(message)
         return Response({"detail": "Message deleted successfully."}, status=status.HTTP_200_OK)
 
 class UserInboxView(APIView):
     """
-    Retrieve a unique conversation list for the logged-in user based on messages received.
+    Retrieve the logged-in user's conversations, most recent activity first, with cursor pagination.
 
-    For each sender, only the most recent message received is returned to create a conversation summary.
+    Each conversation has the other participant, the last message (sent or received), the time
+    of the last activity and the number of messages the user has not read. Pages are located with
+    opaque cursors (?cursor=<token>, ?page_size=<n>); only 'next' cursors are issued.
+    ?fields= and ?expand= apply to the embedded last message.
     This endpoint is accessible by the logged-in user only.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        # Retrieve all messages for the logged-in user ordered by most recent first.
-        all_messages = Message.objects.filter(receiver=request.user).order_by('-created_at')
-        
-        # Create a dictionary to capture the most recent message per unique sender.
-        unique_conversations = {}
-        for message in all_messages:
-            # The first message encountered for a given sender (ordered descending by created_at)
-            # is the most recent.
-            if message.sender_id not in unique_conversations:
-                unique_conversations[message.sender_id] = message
-
-        # Convert the dictionary values into a list.
-        conversation_list = list(unique_conversations.values())
-        serializer = MessageSerializer(conversation_list, many=True, context={'request': request})
-        
+        try:
+            conversations, paginator = get_inbox(request.user, request)
+        except InvalidCursor as e:
+            return Response({
+                "detail": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        fields, expand = parse_sparse_params(request)
         return Response({
-            "detail": "Unique conversations retrieved successfully.",
-            "count": len(conversation_list),
-            "conversations": serializer.data
+            "detail": "Conversations retrieved successfully.",
+            "conversations": serialize_conversations(conversations, request, fields=fields, expand=expand),
+            **paginator.get_page_links()
         }, status=status.HTTP_200_OK)
 
 class MessageHistoryView(APIView):
     """
-    Retrieve the complete message history (conversation) between the logged-in user and a specific target user.
+    Retrieve the message history between the logged-in user and a specific target user, oldest to newest.
 
-    The endpoint collects all messages sent by either party, ordered by the creation time (oldest to newest),
-    providing a natural conversation flow.
+    Pages are anchored on message ids:
+      - no anchor returns the most recent messages,
+      - ?before=<id> the messages older than message <id> ("load older"),
+      - ?after=<id> the messages newer than message <id> ("load newer"),
+    with ?page_size=<n> messages per page. has_more tells whether there are more messages
+    beyond the page in the direction loaded.
     """
     permission_classes = [IsAuthenticated]
 
+    @conditional_get(message_history_validators)
     def get(self, request, user_id, *args, **kwargs):
         # Ensure the target user exists.
-        try:
-            target_user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
+        if not User.objects.filter(id=user_id).exists():
             return Response(
                 {"detail": "Target user not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        # Retrieve the complete conversation between the logged-in user and the target user.
-        conversation = Message.objects.filter(
-            Q(sender=request.user, receiver=target_user) |
-            Q(sender=target_user, receiver=request.user)
-        ).order_by('created_at')
-
-        serializer = MessageSerializer(conversation, many=True, context={'request': request})
+
+        fields, expand = parse_sparse_params(request)
+        try:
+            messages, has_more = get_history(request.user, user_id, request, fields, expand)
+        except ValueError:
+            return Response({
+                "detail": "before and after must be message ids."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = MessageSerializer(messages, many=True, fields=fields, expand=expand, context={'request': request})
         return Response({
             "detail": "Conversation history retrieved successfully.",
-            "count": conversation.count(),
-            "messages": serializer.data
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+            "messages": serializer.data,
+            "has_more": has_more
+        }, status=status.HTTP_200_OK)
+
+class MarkConversationRead(APIView):
+    """
+    Mark the messages the logged-in user received from another user as read.
+
+    Accepts an optional {"message_id": <id>}: messages up to and including that one are marked,
+    and all of them when it is omitted. Returns the number of messages marked, the unread
+    count left in the conversation and the user's unread total across all conversations.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, user_id, *args, **kwargs):
+        up_to_id = request.data.get('message_id')
+        if up_to_id is not None:
+            try:
+                up_to_id = int(up_to_id)
+            except (TypeError, ValueError):
+                return Response({
+                    "detail": "message_id must be a message id."
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            marked, unread_count = mark_read(request.user, user_id, up_to_id)
+        except Conversation.DoesNotExist:
+            return Response({"detail": "Conversation not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            "detail": "Messages marked as read.",
+            "marked": marked,
+            "unread_count": unread_count,
+            "unread_total": get_unread_total(request.user)
+        }, status=status.HTTP_200_OK)
+
+class ExportMessages(APIView):
+    """
+    Stream every message the logged-in user sent or received as newline-delimited JSON, oldest first.
+
+    Memory use stays flat however many messages are exported. An interrupted export is resumed
+    by passing the id of the last message received as ?since_id=<id>.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since_id = parse_since_id(request)
+        except ValueError:
+            return Response({
+                "detail": "since_id must be a non-negative integer."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return StreamingHttpResponse(stream(request, export_messages(request, request.user, since_id)), content_type=NDJSON_CONTENT_TYPE)